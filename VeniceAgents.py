@@ -1,4 +1,6 @@
-from flask import Flask, request, jsonify, render_template_string, session
+from flask import Flask, request, jsonify, session, g, has_request_context, Response
+from werkzeug.test import EnvironBuilder
+from werkzeug.serving import make_server
 import requests
 import os
 import uuid
@@ -7,6 +9,48 @@ from datetime import datetime
 import subprocess
 import shlex
 import re
+import json
+import time
+import gzip
+import hashlib
+import threading
+import argparse
+import atexit
+import codecs
+import logging
+import zlib
+import math
+import base64
+import random
+import queue
+import itertools
+import heapq
+import bisect
+import io
+import sys
+from collections import deque, Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for the optional semantic cache
+    np = None
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it stored images are always served at full size
+    Image = None
+
+try:
+    from flask_sock import Sock
+    from simple_websocket import Client as WebSocketClient, ConnectionClosed
+except ImportError:  # flask-sock is optional; without it the page falls back to plain fetch
+    Sock = None
 
 app = Flask(__name__)
 app.secret_key = "your-secret-key"  # Replace with a strong secret key
@@ -18,40 +62,717 @@ IMAGE_ENDPOINT = "https://api.venice.ai/api/v1/image/generate"
 # Database path for conversation memory
 DB_PATH = "conversation.db"
 
+# Image replies are stored as base64 data URLs behind this prefix and kept out of the full-text index
+IMAGE_MESSAGE_PREFIX = "Image generated: data:"
+IMAGE_HISTORY_PLACEHOLDER = "[Image generated]"  # Stands in for the image data in prompt history
+fts_available = True
+
 # Initialize SQLite database for conversation history
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
+def init_db(db_path=DB_PATH):
+    global fts_available
+    conn = sqlite3.connect(db_path)
     c = conn.cursor()
+    # Freed pages are returned by the retention worker with incremental_vacuum. A new database can
+    # switch modes here; an existing one needs a single full VACUUM (python VeniceAgents.py compact).
+    c.execute("SELECT COUNT(*) FROM sqlite_master")
+    if c.fetchone()[0] == 0:
+        c.execute("PRAGMA auto_vacuum = INCREMENTAL")
     c.execute('''CREATE TABLE IF NOT EXISTS messages (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         session_id TEXT,
         role TEXT,
         content TEXT,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        message_id TEXT
+    )''')
+    c.execute("PRAGMA table_info(messages)")
+    if "message_id" not in [row[1] for row in c.fetchall()]:
+        c.execute("ALTER TABLE messages ADD COLUMN message_id TEXT")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_message_id ON messages (message_id)")
+    # Thumbnails of image messages, derived on first request and dropped with their message
+    c.execute('''CREATE TABLE IF NOT EXISTS image_thumbnails (
+        image_id INTEGER,
+        width INTEGER,
+        format TEXT,
+        data BLOB,
+        PRIMARY KEY (image_id, width, format)
+    )''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS image_thumbnails_delete AFTER DELETE ON messages BEGIN
+        DELETE FROM image_thumbnails WHERE image_id = old.id;
+    END''')
+    # Messages moved out by the retention policy, same ids, content zlib-compressed
+    c.execute('''CREATE TABLE IF NOT EXISTS messages_archive (
+        id INTEGER PRIMARY KEY,
+        session_id TEXT,
+        role TEXT,
+        content BLOB,
+        timestamp DATETIME,
+        message_id TEXT
     )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_messages_archive_session ON messages_archive (session_id, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_messages_archive_message_id ON messages_archive (message_id)")
+    # Archived images get thumbnails too (same id), so deleting an archived row drops them as well
+    c.execute('''CREATE TRIGGER IF NOT EXISTS image_thumbnails_archive_delete AFTER DELETE ON messages_archive BEGIN
+        DELETE FROM image_thumbnails WHERE image_id = old.id;
+    END''')
+    try:
+        init_fts(c)
+    except sqlite3.OperationalError as e:
+        fts_available = False  # SQLite built without FTS5; /search is disabled
+        print(f"Full-text search unavailable: {e}")
     conn.commit()
     conn.close()
 
-init_db()
+# Full-text index over messages, kept in sync by triggers
+def init_fts(c):
+    c.execute("SELECT 1 FROM sqlite_master WHERE name='messages_fts'")
+    exists = c.fetchone() is not None
+    c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='messages', content_rowid='id')")
+    indexed = f"NOT LIKE '{IMAGE_MESSAGE_PREFIX}%'"
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages
+        WHEN new.content {indexed} BEGIN
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages
+        WHEN old.content {indexed} BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS messages_fts_update_old AFTER UPDATE OF content ON messages
+        WHEN old.content {indexed} BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS messages_fts_update_new AFTER UPDATE OF content ON messages
+        WHEN new.content {indexed} BEGIN
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END''')
+    if not exists:
+        # Backfill messages written before the index existed
+        c.execute(f"INSERT INTO messages_fts (rowid, content) SELECT id, content FROM messages WHERE content {indexed}")
+
+# Storage is split into shards, each a complete SQLite database; a session lives in exactly one,
+# picked by a stable hash of its id, so writes to different shards don't wait on one another.
+# With one shard (the default) the single file is DB_PATH itself. Any object with the same
+# paths() and path_for() methods can stand in for ShardedStorage.
+DB_SHARDS = int(os.getenv("VENICE_DB_SHARDS", "1"))
+
+class ShardedStorage:
+    def __init__(self, base_path, shards=1):
+        self.base_path = base_path
+        self.shards = max(shards, 1)
+
+    def paths(self):
+        if self.shards == 1:
+            return [self.base_path]
+        root, ext = os.path.splitext(self.base_path)
+        return [f"{root}-{index:02d}-of-{self.shards:02d}{ext}" for index in range(self.shards)]
+
+    def path_for(self, key):
+        if self.shards == 1:
+            return self.base_path
+        digest = hashlib.sha1(str(key).encode("utf-8")).digest()
+        return self.paths()[int.from_bytes(digest[:8], "big") % self.shards]
+
+    def init(self):
+        for path in self.paths():
+            init_db(path)
+
+storage = ShardedStorage(DB_PATH, DB_SHARDS)
+storage.init()
+
+def deflate_content(content):
+    return zlib.compress(content.encode("utf-8"), 6)
+
+def inflate_content(content):
+    return zlib.decompress(content).decode("utf-8")
+
+# Connection for reads that should also see archived messages: all_messages is the live table
+# plus the archive, decompressed on the fly. Queries filtered on session_id or message_id use
+# the indexes of both tables.
+def open_db(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.create_function("inflate", 1, inflate_content, deterministic=True)
+    conn.execute("CREATE TEMP VIEW all_messages AS "
+                 "SELECT id, session_id, role, content, timestamp, message_id FROM messages UNION ALL "
+                 "SELECT id, session_id, role, inflate(content), timestamp, message_id FROM messages_archive")
+    return conn
 
 # Database functions for memory management
-def save_message(session_id, role, content):
-    conn = sqlite3.connect(DB_PATH)
+# Messages carry a client-assigned message_id; saving the same id twice is a no-op
+def save_message(session_id, role, content, message_id=None):
+    conn = sqlite3.connect(storage.path_for(session_id))
     c = conn.cursor()
-    c.execute("INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
-              (str(session_id), role, content))
+    message_id = message_id or str(uuid.uuid4())
+    # The unique index only covers live rows, so an id that was archived is checked here
+    c.execute("INSERT INTO messages (message_id, session_id, role, content) SELECT ?1, ?2, ?3, ?4 "
+              "WHERE NOT EXISTS (SELECT 1 FROM messages_archive WHERE message_id = ?1) "
+              "ON CONFLICT (message_id) DO NOTHING",
+              (message_id, str(session_id), role, content))
+    inserted = c.rowcount == 1
+    row_id = c.lastrowid
     conn.commit()
     conn.close()
+    if inserted:
+        index_message(session_id, row_id, role, content, message_id)
+    return inserted
 
-def get_recent_history(session_id, limit=10):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT role, content FROM messages WHERE session_id=? ORDER BY id DESC LIMIT ?",
-              (str(session_id), limit))
-    rows = c.fetchall()
-    conn.close()
-    rows.reverse()  # Reverse to chronological order
-    return [{"role": row[0], "content": row[1]} for row in rows]
+# Relevance-based history retrieval: a BM25 index per session, updated on save_message.
+# Prompts get the most relevant earlier messages plus the latest turns instead of a fixed window.
+# The indexes double as a write-through cache of session history: a text turn reads its history
+# (and checks for an already stored reply) from memory. Sessions are evicted least recently used
+# once the cache passes HISTORY_CACHE_BYTES. With several worker processes on one database, set
+# VENICE_HISTORY_CACHE_SHARED=1: each read then checks the session's (count, first id, last id) in
+# SQLite, a covered index lookup, and reloads the session if another process changed it.
+HISTORY_RECENT_TURNS = 4
+HISTORY_RELEVANT_MESSAGES = 3
+HISTORY_INDEX_SESSIONS = 256  # Sessions kept indexed in memory, least recently used dropped first
+HISTORY_CACHE_BYTES = int(float(os.getenv("VENICE_HISTORY_CACHE_MB", "64")) * 1024 * 1024)
+HISTORY_CACHE_SHARED = os.getenv("VENICE_HISTORY_CACHE_SHARED", "") == "1"
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+def tokenize(text):
+    return re.findall(r"\w+", text.lower())
+
+class HistoryIndex:
+    def __init__(self):
+        self.messages = []  # (id, role, content) in chronological order
+        self.message_ids = {}  # Client message id -> position
+        self.term_counts = []
+        self.lengths = []
+        self.postings = {}
+        self.total_length = 0
+        self.size = 0  # Approximate bytes held
+
+    def contains(self, row_id):
+        position = bisect.bisect_left(self.messages, (row_id,))
+        return position < len(self.messages) and self.messages[position][0] == row_id
+
+    def add(self, row_id, role, content, message_id=None):
+        # Rows must arrive in id order; positions are baked into the postings
+        if self.messages and row_id <= self.messages[-1][0]:
+            return
+        if content.startswith(IMAGE_MESSAGE_PREFIX):
+            content = IMAGE_HISTORY_PLACEHOLDER  # Keeps the turn in order without the base64 payload
+        counts = Counter(tokenize(content))
+        position = len(self.messages)
+        self.messages.append((row_id, role, content))
+        if message_id:
+            self.message_ids[message_id] = position
+        self.size += len(content) + 64 * len(counts) + 200
+        self.term_counts.append(counts)
+        self.lengths.append(sum(counts.values()))
+        self.total_length += self.lengths[-1]
+        for term in counts:
+            self.postings.setdefault(term, []).append(position)
+
+    def search(self, query, limit, before):
+        # Scores messages at positions < before, returns the top positions in chronological order
+        total = len(self.messages)
+        if not total or before <= 0:
+            return []
+        avg_length = self.total_length / total or 1
+        scores = {}
+        for term in set(tokenize(query)):
+            positions = self.postings.get(term)
+            if not positions:
+                continue
+            idf = math.log(1 + (total - len(positions) + 0.5) / (len(positions) + 0.5))
+            for position in positions:
+                if position >= before:
+                    break
+                tf = self.term_counts[position][term]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[position] / avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        best = sorted(scores, key=scores.get, reverse=True)[:limit]
+        return sorted(best)
+
+history_index_lock = threading.Lock()
+history_indexes = OrderedDict()
+history_cache_bytes = 0
+
+def session_fingerprint(conn, session_id):
+    # (count, first id, last id) over live and archived rows, answered from the (session_id, id) indexes
+    row = conn.execute(
+        "SELECT (SELECT COUNT(*) FROM messages WHERE session_id=?1) + (SELECT COUNT(*) FROM messages_archive WHERE session_id=?1), "
+        "MIN((SELECT MIN(id) FROM messages WHERE session_id=?1), IFNULL((SELECT MIN(id) FROM messages_archive WHERE session_id=?1), ?2)), "
+        "MAX((SELECT MAX(id) FROM messages WHERE session_id=?1), IFNULL((SELECT MAX(id) FROM messages_archive WHERE session_id=?1), 0))",
+        (session_id, MAX_MESSAGE_ID)).fetchone()
+    return (row[0], row[1], row[2]) if row[0] else (0, None, None)
+
+def load_history_index(session_id):
+    # Caller holds history_index_lock
+    global history_cache_bytes
+    index = history_indexes.get(session_id)
+    if index is not None and HISTORY_CACHE_SHARED:
+        conn = open_db(storage.path_for(session_id))
+        cached = (len(index.messages), index.messages[0][0], index.messages[-1][0]) if index.messages else (0, None, None)
+        if session_fingerprint(conn, session_id) != cached:
+            record_metric("history_cache.stale")
+            history_cache_bytes -= history_indexes.pop(session_id).size
+            index = None
+        conn.close()
+    if index is None:
+        record_metric("history_cache.misses")
+        index = HistoryIndex()
+        conn = open_db(storage.path_for(session_id))
+        c = conn.cursor()
+        c.execute("SELECT id, role, content, message_id FROM all_messages WHERE session_id=? ORDER BY id", (session_id,))
+        for row in c:
+            index.add(*row)
+        conn.close()
+        history_indexes[session_id] = index
+        history_cache_bytes += index.size
+    else:
+        record_metric("history_cache.hits")
+    history_indexes.move_to_end(session_id)
+    evict_history_indexes()
+    return index
+
+def evict_history_indexes():
+    # Caller holds history_index_lock; the most recently used session is always kept
+    global history_cache_bytes
+    while len(history_indexes) > 1 and (len(history_indexes) > HISTORY_INDEX_SESSIONS
+                                        or history_cache_bytes > HISTORY_CACHE_BYTES):
+        _, index = history_indexes.popitem(last=False)
+        history_cache_bytes -= index.size
+        record_metric("history_cache.evictions")
+        record_metric("history_cache.evicted_bytes", index.size)
+
+def index_message(session_id, row_id, role, content, message_id=None):
+    global history_cache_bytes
+    with history_index_lock:
+        index = history_indexes.get(str(session_id))
+        if index is not None and index.messages and row_id <= index.messages[-1][0]:
+            # Saves to one session can commit in one order and get here in the other. A row that
+            # is already cached was read back by a reload; otherwise the session is dropped so the
+            # next read reloads it in id order instead of silently missing this message.
+            if not index.contains(row_id):
+                history_cache_bytes -= history_indexes.pop(str(session_id)).size
+                record_metric("history_cache.reordered")
+        elif index is not None:
+            size = index.size
+            index.add(row_id, role, content, message_id)
+            history_cache_bytes += index.size - size
+            evict_history_indexes()
+
+def drop_history_index(session_id):
+    global history_cache_bytes
+    with history_index_lock:
+        index = history_indexes.pop(str(session_id), None)
+        if index is not None:
+            history_cache_bytes -= index.size
+
+def get_session_message(session_id, message_id):
+    # Content of a message in this session by client id, from the cache when the session is loaded
+    with history_index_lock:
+        index = load_history_index(str(session_id))
+        position = index.message_ids.get(message_id)
+        return index.messages[position][2] if position is not None else None
+
+def history_cache_stats():
+    with history_index_lock:
+        return {"history_cache.sessions": len(history_indexes), "history_cache.bytes": history_cache_bytes}
+
+def get_relevant_history(session_id, query, recent=HISTORY_RECENT_TURNS, relevant=HISTORY_RELEVANT_MESSAGES):
+    with history_index_lock:
+        index = load_history_index(str(session_id))
+        before = max(len(index.messages) - recent, 0)
+        positions = index.search(query, relevant, before) + list(range(before, len(index.messages)))
+        return [{"role": index.messages[p][1], "content": index.messages[p][2]} for p in positions]
+
+# Record-and-replay of real sessions
+# Set VENICE_TRACE_PATH to capture inbound traffic plus upstream responses (".gz" for gzip),
+# and VENICE_REPLAY_TRACE to serve upstream calls from a recorded trace instead of Venice.
+TRACE_PATH = os.getenv("VENICE_TRACE_PATH", "")
+REPLAY_TRACE_PATH = os.getenv("VENICE_REPLAY_TRACE", "")
+TRACE_ENDPOINTS = {"/chat", "/generate_subtasks", "/check_completion", "/execute", "/execute_subtask", "/save_message"}
+trace_lock = threading.Lock()
+trace_file = None
+trace_started = time.time()
+
+def open_trace_file(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def payload_hash(payload):
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def write_trace_record(record):
+    global trace_file
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    with trace_lock:
+        if trace_file is None:
+            trace_file = open_trace_file(TRACE_PATH, "a")
+            atexit.register(trace_file.close)
+        trace_file.write(line)
+        trace_file.flush()
+
+def read_trace(path):
+    with open_trace_file(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+@app.before_request
+def start_trace():
+    if TRACE_PATH and request.path in TRACE_ENDPOINTS:
+        g.trace = {"start": time.time(), "upstream": []}
+
+@app.after_request
+def finish_trace(response):
+    trace = g.pop("trace", None)
+    if trace is None:
+        return response
+    args = (trace, request.path, request.get_json(silent=True), session.get("session_id"),
+            request.content_length or 0, response.status_code)
+    if not response.is_streamed:
+        write_request_trace(*args, response.calculate_content_length() or 0)
+        return response
+    # A streamed body makes its upstream calls while it is read, so the record waits for the close
+    sent = [0]
+    body = response.response
+
+    def counted():
+        for chunk in body:
+            sent[0] += len(chunk)
+            yield chunk
+
+    response.response = counted()
+    response.call_on_close(lambda: write_request_trace(*args, sent[0]))
+    return response
+
+def write_request_trace(trace, path, body, session_id, request_bytes, status, response_bytes):
+    body = dict(body or {})
+    body.pop("api_key", None)  # Never write credentials into a trace
+    write_trace_record({
+        "t": round(trace["start"] - trace_started, 4),
+        "session": hashlib.sha256((session_id or "").encode("utf-8")).hexdigest()[:16],
+        "path": path,
+        "body": body,
+        "request_bytes": request_bytes,
+        "status": status,
+        "response_bytes": response_bytes,
+        "duration_ms": round((time.time() - trace["start"]) * 1000, 2),
+        "upstream": trace["upstream"]
+    })
+
+class RecordedResponse:
+    # Minimal stand-in for requests.Response when serving upstream calls from a trace
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {}
+        self.content = text.encode("utf-8")
+
+    def json(self):
+        return json.loads(self.text)
+
+replay_lock = threading.Lock()
+replay_by_hash = None
+replay_by_endpoint = None
+
+def load_replay_responses():
+    global replay_by_hash, replay_by_endpoint
+    replay_by_hash, replay_by_endpoint = {}, {}
+    for record in read_trace(REPLAY_TRACE_PATH):
+        for call in record.get("upstream", []):
+            call = dict(call, used=False)
+            replay_by_hash.setdefault(call["payload_hash"], deque()).append(call)
+            replay_by_endpoint.setdefault(call["endpoint"], deque()).append(call)
+
+def next_unused(calls):
+    while calls:
+        call = calls.popleft()
+        if not call["used"]:
+            call["used"] = True
+            return call
+    return None
+
+def replay_upstream_response(endpoint, payload):
+    # Prefer the exact recorded payload; fall back to the next recorded call to the same endpoint
+    with replay_lock:
+        if replay_by_hash is None:
+            load_replay_responses()
+        call = next_unused(replay_by_hash.get(payload_hash(payload), deque()))
+        if call is None:
+            call = next_unused(replay_by_endpoint.get(endpoint, deque()))
+    if call is None:
+        return RecordedResponse(503, "No recorded upstream response available")
+    return RecordedResponse(call["status"], call["body"])
+
+# In-process metrics, exposed at /metrics
+metrics_lock = threading.Lock()
+metrics = {}
+
+def record_metric(name, value=1):
+    with metrics_lock:
+        metrics[name] = metrics.get(name, 0) + value
+
+# Single-flight coalescing: concurrent identical upstream calls share one request
+inflight_lock = threading.Lock()
+inflight_calls = {}
+
+def single_flight(key, fn):
+    with inflight_lock:
+        call = inflight_calls.get(key)
+        leader = call is None
+        if leader:
+            call = {"done": threading.Event(), "result": None, "error": None}
+            inflight_calls[key] = call
+    if not leader:
+        call["done"].wait()
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"], True
+    try:
+        call["result"] = fn()
+    except Exception as e:
+        call["error"] = e
+        raise
+    finally:
+        with inflight_lock:
+            del inflight_calls[key]
+        call["done"].set()
+    return call["result"], False
+
+def send_upstream(endpoint, payload, headers):
+    if REPLAY_TRACE_PATH:
+        return replay_upstream_response(endpoint, payload)
+    response = requests.post(endpoint, json=payload, headers=headers)
+    response.content  # Read the body now so coalesced callers can share the response safely
+    return response
+
+# All calls to the Venice API go through here so they can be recorded, replayed or coalesced.
+# Pass coalesce="<label>" for cacheable calls whose identical concurrent payloads may share a result.
+def trace_upstream_call(trace, endpoint, payload, status, text, start, shared):
+    trace["upstream"].append({
+        "endpoint": endpoint,
+        "payload_hash": payload_hash(payload),
+        "status": status,
+        "body": text,
+        "bytes": len(text.encode("utf-8")),
+        "duration_ms": round((time.time() - start) * 1000, 2),
+        "coalesced": shared
+    })
+
+# Work that runs outside the request (worker threads, channel frames) passes its trace explicitly
+def post_upstream(endpoint, payload, headers, coalesce=None, trace=None):
+    start = time.time()
+    shared = False
+    if coalesce:
+        key = payload_hash({"endpoint": endpoint, "payload": payload, "auth": headers.get("Authorization", "")})
+        response, shared = single_flight(key, lambda: send_upstream(endpoint, payload, headers))
+        record_metric(f"coalesce.{coalesce}.{'shared' if shared else 'leader'}")
+    else:
+        response = send_upstream(endpoint, payload, headers)
+    record_metric("upstream.calls" if not shared else "upstream.calls_saved")
+    if trace is None and has_request_context():
+        trace = g.get("trace")
+    if trace is not None:
+        trace_upstream_call(trace, endpoint, payload, response.status_code, response.text, start, shared)
+    return response
+
+@app.route("/metrics")
+def metrics_route():
+    with metrics_lock:
+        snapshot = dict(metrics)
+    for label in sorted({name.split(".")[1] for name in snapshot if name.startswith("coalesce.")}):
+        leaders = snapshot.get(f"coalesce.{label}.leader", 0)
+        shared = snapshot.get(f"coalesce.{label}.shared", 0)
+        snapshot[f"coalesce.{label}.rate"] = round(shared / (leaders + shared), 4) if leaders + shared else 0.0
+    snapshot.update(history_cache_stats())
+    snapshot.update(admission.stats())
+    hits, misses = snapshot.get("history_cache.hits", 0), snapshot.get("history_cache.misses", 0)
+    snapshot["history_cache.hit_rate"] = round(hits / (hits + misses), 4) if hits + misses else 0.0
+    jobs = snapshot.get("agent.jobs", 0)
+    snapshot["agent.iterations.wasted_per_job"] = round(snapshot.get("agent.iterations.wasted", 0) / jobs, 4) if jobs else 0.0
+    return jsonify(snapshot)
+
+# Admission control: requests are grouped into classes with their own concurrency slots and
+# bounded queues, and all classes share ADMISSION_TOTAL_SLOTS. A free slot goes to the waiting
+# request of the highest-priority class (lowest number) that still has room, so interactive chat
+# is served ahead of agent work. Requests that cannot be queued, or wait past their class
+# deadline, get a 503 with Retry-After right away instead of timing out later.
+ADMISSION_TOTAL_SLOTS = int(os.getenv("VENICE_ADMISSION_SLOTS", "32"))
+ADMISSION_CLASSES = {
+    # name: (priority, slots, queue length, queue deadline in seconds)
+    "chat": (0, 16, 64, 10),
+    "persistence": (1, 16, 128, 5),
+    "image": (2, 4, 16, 30),
+    "agent": (3, 8, 32, 30),
+}
+ADMISSION_PATHS = {"/generate_subtasks": "agent", "/check_completion": "agent", "/execute_subtask": "agent",
+                   "/execute": "agent", "/batch": "agent", "/save_message": "persistence", "/new_chat": "persistence",
+                   "/history": "persistence", "/import": "persistence", "/export": "persistence"}
+
+class AdmissionRejected(Exception):
+    def __init__(self, name, reason, retry_after):
+        super().__init__(f"{name} {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    def __init__(self, classes, total_slots):
+        self.classes = classes
+        self.total_slots = total_slots
+        self.cond = threading.Condition()
+        self.active = {name: 0 for name in classes}
+        self.queued = {name: 0 for name in classes}
+        self.service_ms = {name: 100.0 for name in classes}  # Moving average, used for Retry-After
+        self.waiters = []  # Heap of (priority, seq, name)
+        self.seq = 0
+
+    def next_grant(self):
+        # Caller holds cond: the waiter that should get the next free slot, if any can start now
+        if sum(self.active.values()) >= self.total_slots:
+            return None
+        for waiter in sorted(self.waiters):
+            name = waiter[2]
+            if self.active[name] < self.classes[name][1]:
+                return waiter
+        return None
+
+    def retry_after(self, name):
+        priority, slots, queue_length, deadline = self.classes[name]
+        backlog = (self.queued[name] + self.active[name]) / slots
+        return max(1, math.ceil(backlog * self.service_ms[name] / 1000))
+
+    def acquire(self, name):
+        priority, slots, queue_length, deadline = self.classes[name]
+        start = time.time()
+        with self.cond:
+            if self.queued[name] >= queue_length:
+                record_metric(f"admission.{name}.rejected")
+                raise AdmissionRejected(name, "queue full", self.retry_after(name))
+            self.seq += 1
+            waiter = (priority, self.seq, name)
+            heapq.heappush(self.waiters, waiter)
+            self.queued[name] += 1
+            try:
+                while self.next_grant() != waiter:
+                    remaining = start + deadline - time.time()
+                    if remaining <= 0:
+                        record_metric(f"admission.{name}.expired")
+                        raise AdmissionRejected(name, "queue deadline passed", self.retry_after(name))
+                    self.cond.wait(remaining)
+            finally:
+                self.waiters.remove(waiter)
+                heapq.heapify(self.waiters)
+                self.queued[name] -= 1
+                self.cond.notify_all()  # The head of the queue may have changed
+            self.active[name] += 1
+        record_metric(f"admission.{name}.admitted")
+        record_metric(f"admission.{name}.wait_ms", round((time.time() - start) * 1000, 2))
+        return time.time()
+
+    def release(self, name, started):
+        with self.cond:
+            self.active[name] -= 1
+            self.service_ms[name] = 0.9 * self.service_ms[name] + 0.1 * (time.time() - started) * 1000
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            snapshot = {}
+            for name in self.classes:
+                snapshot[f"admission.{name}.active"] = self.active[name]
+                snapshot[f"admission.{name}.queued"] = self.queued[name]
+            return snapshot
+
+admission = AdmissionController(ADMISSION_CLASSES, ADMISSION_TOTAL_SLOTS)
+
+def admission_class(path, body):
+    if path == "/chat":
+        return {"image": "image", "agent": "agent"}.get((body or {}).get("mode", "text"), "chat")
+    return ADMISSION_PATHS.get(path)
+
+def admission_rejected_response(error):
+    response = jsonify({"error": f"Server busy ({error.reason}), retry later", "retry_after": error.retry_after})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+@app.before_request
+def admit_request():
+    if request.method != "POST" and request.path not in ("/history", "/export"):
+        return None
+    name = admission_class(request.path, request.get_json(silent=True) if request.path == "/chat" else None)
+    if name is None:
+        return None
+    try:
+        g.admission = (name, admission.acquire(name))
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    return None
+
+@app.after_request
+def hold_admission(response):
+    # Streamed bodies keep their slot until the client has read them
+    ticket = g.pop("admission", None)
+    if ticket is not None:
+        response.call_on_close(lambda: admission.release(*ticket))
+    return response
+
+@app.teardown_request
+def release_admission(error):
+    ticket = g.pop("admission", None)  # Still set only when the view failed before after_request
+    if ticket is not None:
+        admission.release(*ticket)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+# Replays a recorded trace against a running build at original (speed=1) or scaled speed
+def replay_trace(path, target, speed=1.0, workers=32):
+    records = sorted(read_trace(path), key=lambda r: r["t"])
+    clients = {}
+    results = []
+    results_lock = threading.Lock()
+
+    def client_for(session_key):
+        with results_lock:
+            if session_key not in clients:
+                client = requests.Session()
+                client.get(target + "/")  # Obtain a session cookie like a browser tab would
+                clients[session_key] = client
+            return clients[session_key]
+
+    def send(record):
+        client = client_for(record["session"])
+        start = time.time()
+        try:
+            response = client.post(target + record["path"], json=record["body"])
+            status = response.status_code
+        except Exception as e:
+            status = f"exception: {e}"
+        with results_lock:
+            results.append((record, status, (time.time() - start) * 1000))
+
+    replay_start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for record in records:
+            if speed > 0:
+                delay = record["t"] / speed - (time.time() - replay_start)
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(send, record)
+
+    print(f"Replayed {len(results)} requests in {time.time() - replay_start:.2f}s")
+    print(f"{'endpoint':<20}{'count':>7}{'errors':>8}{'rec p50':>10}{'rec p95':>10}{'new p50':>10}{'new p95':>10}")
+    for path in sorted({r["path"] for r in records}):
+        rows = [(rec, status, ms) for rec, status, ms in results if rec["path"] == path]
+        recorded = [rec["duration_ms"] for rec, _, _ in rows]
+        replayed = [ms for _, _, ms in rows]
+        errors = sum(1 for rec, status, _ in rows if status != rec["status"])
+        print(f"{path:<20}{len(rows):>7}{errors:>8}"
+              f"{percentile(recorded, 50):>10.1f}{percentile(recorded, 95):>10.1f}"
+              f"{percentile(replayed, 50):>10.1f}{percentile(replayed, 95):>10.1f}")
 
 # Token estimation and summarization
 TOKEN_THRESHOLD = 1000  # Rough word count threshold for summarization
@@ -85,7 +806,7 @@ def summarize_history(messages, api_key, model, top_p, max_tokens, presence_pena
         if default_key:
             headers["Authorization"] = f"Bearer {default_key}"
     try:
-        response = requests.post(TEXT_ENDPOINT, json=payload, headers=headers)
+        response = post_upstream(TEXT_ENDPOINT, payload, headers, coalesce="summarize")
         if response.status_code == 200:
             return response.json()["choices"][0]["message"]["content"].strip()
         else:
@@ -93,21 +814,448 @@ def summarize_history(messages, api_key, model, top_p, max_tokens, presence_pena
     except Exception as e:
         return "Summary unavailable due to an exception."
 
+# Semantic near-duplicate prompt cache for text mode (optional, requires NumPy)
+# Enable with VENICE_SEMANTIC_CACHE=1. Memory is bounded by capacity * dim * 4 bytes for the
+# vectors plus VENICE_SEMANTIC_CACHE_REPLY_MB for cached replies.
+SEMANTIC_CACHE_ENABLED = os.getenv("VENICE_SEMANTIC_CACHE", "") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("VENICE_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("VENICE_SEMANTIC_CACHE_SIZE", "20000"))
+SEMANTIC_CACHE_DIM = 256
+SEMANTIC_CACHE_REPLY_BYTES = int(float(os.getenv("VENICE_SEMANTIC_CACHE_REPLY_MB", "64")) * 1024 * 1024)
+
+def embed_text(text, dim=SEMANTIC_CACHE_DIM):
+    # Hashed word unigrams and character trigrams, L2-normalized
+    vec = np.zeros(dim, dtype=np.float32)
+    words = re.findall(r"\w+", text.lower())
+    for word in words:
+        vec[zlib.crc32(word.encode("utf-8")) % dim] += 2.0
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            vec[zlib.crc32(padded[i:i + 3].encode("utf-8")) % dim] += 1.0
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec /= norm
+    return vec
+
+def semantic_scope(system_prompt, model):
+    # Stable non-negative 60-bit id so scopes fit in an int64 array
+    return int(payload_hash({"system_prompt": system_prompt, "model": model})[:15], 16)
+
+class SemanticCache:
+    def __init__(self, capacity, dim=SEMANTIC_CACHE_DIM, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 max_reply_bytes=SEMANTIC_CACHE_REPLY_BYTES):
+        self.lock = threading.Lock()
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+        self.max_reply_bytes = max_reply_bytes
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.scopes = np.full(capacity, -1, dtype=np.int64)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.replies = [None] * capacity
+        self.reply_bytes = 0
+        self.count = 0
+        self.tick = 0
+
+    def lookup(self, text, scope):
+        vec = embed_text(text, self.dim)
+        with self.lock:
+            if self.count == 0:
+                return None
+            sims = self.vectors[:self.count] @ vec
+            sims[self.scopes[:self.count] != scope] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            self.tick += 1
+            self.last_used[best] = self.tick
+            return self.replies[best]
+
+    def add(self, text, scope, reply):
+        size = len(reply.encode("utf-8"))
+        if size > self.max_reply_bytes:
+            return
+        vec = embed_text(text, self.dim)
+        with self.lock:
+            while self.reply_bytes + size > self.max_reply_bytes:
+                self.evict(self.oldest_entry())
+            slot = self.count if self.count < self.capacity else self.lru_slot()
+            if slot == self.count:
+                self.count += 1
+            else:
+                self.evict(slot)
+            self.tick += 1
+            self.vectors[slot] = vec
+            self.scopes[slot] = scope
+            self.last_used[slot] = self.tick
+            self.replies[slot] = reply
+            self.reply_bytes += size
+
+    def lru_slot(self):
+        # Vacated slots keep last_used at 0, so they are reused first
+        return int(np.argmin(self.last_used[:self.count]))
+
+    def oldest_entry(self):
+        ages = np.where(self.scopes[:self.count] >= 0, self.last_used[:self.count], np.iinfo(np.int64).max)
+        return int(np.argmin(ages))
+
+    def evict(self, slot):
+        if self.replies[slot] is not None:
+            self.reply_bytes -= len(self.replies[slot].encode("utf-8"))
+            record_metric("semantic_cache.evictions")
+        self.vectors[slot] = 0
+        self.scopes[slot] = -1
+        self.last_used[slot] = 0
+        self.replies[slot] = None
+
+semantic_cache = SemanticCache(SEMANTIC_CACHE_CAPACITY) if SEMANTIC_CACHE_ENABLED and np is not None else None
+
+def benchmark_semantic_cache(entries=100000, lookups=200, dim=SEMANTIC_CACHE_DIM):
+    if np is None:
+        print("NumPy is required for the semantic cache benchmark.")
+        return
+    cache = SemanticCache(entries, dim=dim)
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((entries, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    # Fill the matrix directly; the benchmark measures lookups, not inserts
+    cache.vectors[:] = vectors
+    cache.scopes[:] = rng.integers(0, 8, entries)
+    cache.replies = ["cached reply"] * entries
+    cache.count = entries
+    timings = []
+    for i in range(lookups):
+        start = time.perf_counter()
+        cache.lookup(f"how do I reverse a linked list in python, variant {i}", i % 8)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"Semantic cache lookup over {entries} entries (dim={dim}, "
+          f"{cache.vectors.nbytes / 1024 / 1024:.1f} MB of vectors):")
+    print(f"  p50 {percentile(timings, 50):.3f} ms  p95 {percentile(timings, 95):.3f} ms  "
+          f"p99 {percentile(timings, 99):.3f} ms")
+
+# Command execution engine: commands run in a bounded pool of slots, stream their output live,
+# and keep only the head and tail of stdout/stderr so results stay small enough for prompts
+ALLOWED_COMMANDS = ['ls', 'pwd', 'whoami', 'echo']
+COMMAND_SLOTS = 4
+COMMAND_TIMEOUT = 10
+COMMAND_MAX_TIMEOUT = 300
+COMMAND_HEAD_CHARS = 8000
+COMMAND_TAIL_CHARS = 8000
+COMMAND_STREAM_CHUNKS = 512  # Live chunks kept for stream readers that fall behind
+COMMAND_HISTORY = 100  # Finished runs kept for polling
+COMMAND_MAX_PENDING = COMMAND_SLOTS * 4  # Queued plus running; async starts beyond this get a 503
+command_pool = ThreadPoolExecutor(max_workers=COMMAND_SLOTS)
+command_runs_lock = threading.Lock()
+command_runs = OrderedDict()
+
+class OutputBuffer:
+    # Keeps the first head_limit and the last tail_limit characters of a stream
+    def __init__(self, head_limit=COMMAND_HEAD_CHARS, tail_limit=COMMAND_TAIL_CHARS):
+        self.head_limit = head_limit
+        self.tail_limit = tail_limit
+        self.head = []
+        self.head_size = 0
+        self.tail = deque()
+        self.tail_size = 0
+        self.total = 0
+
+    def write(self, text):
+        self.total += len(text)
+        if self.head_size < self.head_limit:
+            taken = text[:self.head_limit - self.head_size]
+            self.head.append(taken)
+            self.head_size += len(taken)
+            text = text[len(taken):]
+        if text:
+            self.tail.append(text)
+            self.tail_size += len(text)
+            while self.tail_size - len(self.tail[0]) >= self.tail_limit:
+                self.tail_size -= len(self.tail.popleft())
+            if self.tail_size > self.tail_limit:
+                excess = self.tail_size - self.tail_limit
+                self.tail[0] = self.tail[0][excess:]
+                self.tail_size -= excess
+
+    def truncated(self):
+        return self.total > self.head_size + self.tail_size
+
+    def render(self):
+        head, tail = "".join(self.head), "".join(self.tail)
+        if self.truncated():
+            return f"{head}\n... [{self.total - len(head) - len(tail)} characters omitted] ...\n{tail}"
+        return head + tail
+
+class CommandRun:
+    def __init__(self, command, parts, timeout, session_id):
+        self.id = str(uuid.uuid4())
+        self.command = command
+        self.parts = parts
+        self.timeout = timeout
+        self.session_id = session_id
+        self.status = "queued"
+        self.stdout = OutputBuffer()
+        self.stderr = OutputBuffer()
+        self.chunks = deque(maxlen=COMMAND_STREAM_CHUNKS)
+        self.seq = 0
+        self.changed = threading.Condition()
+        self.done = threading.Event()
+        self.process = None
+        self.cancelled = False
+        self.timed_out = False
+        self.error = None
+        self.exit_code = None
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def execute(self):
+        if self.cancelled:
+            self.finish()
+            return
+        self.started_at = time.time()
+        self.status = "running"
+        try:
+            self.process = subprocess.Popen(self.parts, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except Exception as e:
+            self.error = str(e)
+            self.finish()
+            return
+        readers = [threading.Thread(target=self.pump, args=(self.process.stdout, "stdout", self.stdout)),
+                   threading.Thread(target=self.pump, args=(self.process.stderr, "stderr", self.stderr))]
+        for reader in readers:
+            reader.start()
+        try:
+            self.process.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            self.timed_out = True
+            self.process.kill()
+            self.process.wait()
+        for reader in readers:
+            reader.join()
+        self.exit_code = self.process.returncode
+        self.finish()
+
+    def pump(self, pipe, stream, buffer):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        for data in iter(lambda: pipe.read1(4096), b""):
+            text = decoder.decode(data)
+            if text:
+                with self.changed:
+                    buffer.write(text)
+                    self.seq += 1
+                    self.chunks.append((self.seq, stream, text))
+                    self.changed.notify_all()
+        pipe.close()
+
+    def cancel(self):
+        self.cancelled = True
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            # Escalate if the process ignores SIGTERM
+            threading.Timer(2, lambda: self.process.poll() is None and self.process.kill()).start()
+
+    def finish(self):
+        self.finished_at = time.time()
+        if self.error is not None:
+            self.status = "error"
+        elif self.timed_out:
+            self.status = "timeout"
+            record_metric("command.timeouts")
+        elif self.cancelled:
+            self.status = "cancelled"
+            record_metric("command.cancelled")
+        else:
+            self.status = "finished"
+            record_metric(f"command.exit.{self.exit_code}")
+        record_metric("command.count")
+        record_metric("command.queue_ms", round(((self.started_at or self.finished_at) - self.queued_at) * 1000, 2))
+        if self.started_at is not None:
+            record_metric("command.duration_ms", round((self.finished_at - self.started_at) * 1000, 2))
+        with self.changed:
+            self.done.set()
+            self.changed.notify_all()
+
+    def result_text(self):
+        # Same wording as the original synchronous runner, so prompts and the UI read the same
+        if self.error is not None:
+            return f"Execution error: {self.error}"
+        if self.timed_out:
+            return f"Execution error: Command '{self.command}' timed out after {self.timeout} seconds"
+        if self.cancelled:
+            return "Command cancelled."
+        if self.exit_code == 0:
+            return self.stdout.render().strip()
+        return f"Error: {self.stderr.render().strip()}"
+
+    def snapshot(self):
+        with self.changed:
+            finished = self.done.is_set()
+            return {
+                "command_id": self.id,
+                "command": self.command,
+                "status": self.status,
+                "exit_code": self.exit_code,
+                "queue_ms": round(((self.started_at or time.time()) - self.queued_at) * 1000, 2),
+                "duration_ms": round(((self.finished_at or time.time()) - self.started_at) * 1000, 2) if self.started_at else None,
+                "stdout": self.stdout.render(),
+                "stderr": self.stderr.render(),
+                "truncated": self.stdout.truncated() or self.stderr.truncated(),
+                "output": self.result_text() if finished else None
+            }
+
+def start_command(command, approved=False, timeout=COMMAND_TIMEOUT, session_id=None):
+    # Returns (run, None), or (None, message) when the command is refused
+    try:
+        parts = shlex.split(command)
+    except ValueError as e:
+        return None, f"Execution error: {str(e)}"
+    if not parts or not (parts[0] in ALLOWED_COMMANDS or approved):
+        return None, "Command not allowed."
+    try:
+        timeout = min(max(float(timeout), 1), COMMAND_MAX_TIMEOUT)
+    except (TypeError, ValueError):
+        return None, "Execution error: timeout must be a number of seconds."
+    run = CommandRun(command, parts, timeout, session_id)
+    with command_runs_lock:
+        # Async starts return at once and free their admission slot, so the pool bounds itself
+        if sum(not other.done.is_set() for other in command_runs.values()) >= COMMAND_MAX_PENDING:
+            record_metric("command.rejected")
+            raise AdmissionRejected("command", "command queue full", 1)
+        command_runs[run.id] = run
+        finished = [run_id for run_id, other in command_runs.items() if other.done.is_set()]
+        for run_id in finished[:max(len(finished) - COMMAND_HISTORY, 0)]:
+            del command_runs[run_id]
+    command_pool.submit(run.execute)
+    return run, None
+
 # Function to run terminal commands securely
 def run_terminal_command(command, approved=False):
-    allowed_commands = ['ls', 'pwd', 'whoami', 'echo']
-    parts = shlex.split(command)
-    if parts and (parts[0] in allowed_commands or approved):
+    try:
+        run, refusal = start_command(command, approved)
+    except AdmissionRejected as e:
+        return f"Execution error: {e.reason}, try again later."
+    if run is None:
+        return refusal
+    run.done.wait()
+    return run.result_text()
+
+# Structured agent plans: the control calls ask for a small JSON object and share one parser.
+# Output that is not clean JSON is repaired locally first (reasoning blocks, markdown fences,
+# preambles, trailing commas, or the older "TEXT: ..." line format); only if that fails is a short,
+# low-temperature repair call made, which is far cheaper than re-running the whole control call.
+PLAN_FORMAT = (
+    'Respond with only a JSON object, no other text: '
+    '{"status": "complete" | "more" | "question", '
+    '"subtasks": [{"type": "text" | "command", "content": "..."}], "question": "..."}. '
+    'Use "text" subtasks for text generation and "command" subtasks for a single terminal command.'
+)
+PLAN_REPAIR_MAX_TOKENS = 1024
+PLAN_REPAIR_INPUT_CHARS = 6000
+
+class PlanFormatError(ValueError):
+    pass
+
+def validate_plan(plan):
+    if not isinstance(plan, dict):
+        raise PlanFormatError("Plan is not a JSON object")
+    items = plan.get("subtasks") or []
+    if not isinstance(items, list):
+        raise PlanFormatError("Plan subtasks is not a list")
+    subtasks = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"type": "text", "content": item}
+        if not isinstance(item, dict):
+            raise PlanFormatError(f"Invalid subtask: {item!r}")
+        kind = str(item.get("type", "")).lower()
+        content = str(item.get("content", "")).strip()
+        if kind not in ("text", "command") or not content:
+            raise PlanFormatError(f"Invalid subtask: {item!r}")
+        subtasks.append({"type": kind, "content": content})
+    status = str(plan.get("status") or ("more" if subtasks else "")).lower()
+    question = str(plan.get("question") or "").strip()
+    if status == "more" and not subtasks:
+        raise PlanFormatError("Plan asks for more subtasks but lists none")
+    if status == "question" and not question:
+        raise PlanFormatError("Plan asks a question but gives none")
+    if not status:
+        raise PlanFormatError("No plan found")
+    if status not in ("complete", "more", "question"):
+        raise PlanFormatError(f"Unknown plan status: {status!r}")
+    return {"status": status, "subtasks": subtasks, "question": question}
+
+def parse_legacy_plan(text):
+    # The line format the control calls used before they asked for JSON
+    subtasks = []
+    status = None
+    question = ""
+    for line in text.split("\n"):
+        line = line.strip().lstrip("-*0123456789.) ").strip()
+        upper = line.upper()
+        if upper.startswith("TEXT:"):
+            subtasks.append({"type": "text", "content": line[5:].strip()})
+        elif upper.startswith("COMMAND:"):
+            subtasks.append({"type": "command", "content": line[8:].strip()})
+        elif upper.startswith("RUN COMMAND:"):
+            subtasks.append({"type": "command", "content": line[12:].strip()})
+        elif upper.startswith("QUESTION:") and status is None:
+            status, question = "question", line[9:].strip()
+        elif upper.startswith("COMPLETE") and status is None:
+            status = "complete"
+    if subtasks:
+        status = "more"
+    return validate_plan({"status": status, "subtasks": subtasks, "question": question})
+
+def parse_plan(text):
+    # Returns (plan, repaired) or raises PlanFormatError
+    text = re.sub(r"<think>.*?(</think>|$)", "", text, flags=re.S).strip()
+    try:
+        return validate_plan(json.loads(text)), False
+    except (ValueError, AttributeError):
+        pass
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        candidate = re.sub(r",\s*([}\]])", r"\1", text[start:end + 1])
         try:
-            result = subprocess.run(parts, capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                return result.stdout.strip()
-            else:
-                return f"Error: {result.stderr.strip()}"
-        except Exception as e:
-            return f"Execution error: {str(e)}"
-    else:
-        return "Command not allowed."
+            return validate_plan(json.loads(candidate)), True
+        except (ValueError, AttributeError):
+            pass
+    return parse_legacy_plan(text), True
+
+def repair_plan(text, headers, model):
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": "You convert text into JSON. " + PLAN_FORMAT},
+            {"role": "user", "content": text[-PLAN_REPAIR_INPUT_CHARS:]}
+        ],
+        "temperature": 0,
+        "max_tokens": PLAN_REPAIR_MAX_TOKENS
+    }
+    response = post_upstream(TEXT_ENDPOINT, payload, headers)
+    if response.status_code != 200:
+        raise PlanFormatError(f"Repair call failed: {response.text}")
+    plan, _ = parse_plan(response.json()["choices"][0]["message"]["content"])
+    return plan
+
+def read_plan(text, headers, model, label):
+    # One control call's plan. Outcomes are counted per label; a plan that can't be recovered
+    # counts as a wasted agent iteration.
+    try:
+        plan, repaired = parse_plan(text)
+        record_metric(f"agent.plan.{label}.{'repaired' if repaired else 'parsed'}")
+        return plan
+    except PlanFormatError:
+        pass
+    try:
+        plan = repair_plan(text, headers, model)
+        record_metric(f"agent.plan.{label}.repair_call")
+        return plan
+    except (PlanFormatError, requests.RequestException, KeyError, IndexError, ValueError) as e:
+        record_metric(f"agent.plan.{label}.failed")
+        record_metric("agent.iterations.wasted")
+        app.logger.error(f"Unrecoverable {label} plan ({e}): {text}")
+        return None
 
 # New endpoint to generate subtasks
 @app.route("/generate_subtasks", methods=["POST"])
@@ -130,8 +1278,8 @@ def generate_subtasks():
             headers["Authorization"] = f"Bearer {default_key}"
     
     decomposition_prompt = (
-        f"Decompose the following task into a list of subtasks. "
-        f"Each subtask should be on a new line and start with 'TEXT: ' for text generation tasks or 'COMMAND: ' for commands to execute.\n"
+        f"Decompose the following task into a list of subtasks, with status \"more\".\n"
+        f"{PLAN_FORMAT}\n"
         f"Task: {task}"
     )
     payload = {
@@ -147,17 +1295,14 @@ def generate_subtasks():
         "frequency_penalty": frequency_penalty
     }
     try:
-        response = requests.post(TEXT_ENDPOINT, json=payload, headers=headers)
+        record_metric("agent.jobs")
+        response = post_upstream(TEXT_ENDPOINT, payload, headers, coalesce="generate_subtasks")
         if response.status_code == 200:
             decomposition = response.json()["choices"][0]["message"]["content"].strip()
-            subtasks = []
-            for line in decomposition.split('\n'):
-                line = line.strip()
-                if line.startswith("TEXT:"):
-                    subtasks.append({"type": "text", "content": line[5:].strip()})
-                elif line.startswith("COMMAND:"):
-                    subtasks.append({"type": "command", "content": line[8:].strip()})
-            return jsonify({"subtasks": subtasks})
+            plan = read_plan(decomposition, headers, model, "generate_subtasks")
+            if plan is None or not plan["subtasks"]:
+                return jsonify({"error": "Could not read subtasks from the model's reply"}), 500
+            return jsonify({"subtasks": plan["subtasks"]})
         else:
             return jsonify({"error": f"API error: {response.text}"}), 500
     except Exception as e:
@@ -188,9 +1333,9 @@ def check_completion():
     results_str = "\n".join([f"Subtask: {res['subtask']}\nResult: {res['result']}" for res in results])
     check_prompt = (
         f"Based on the following task and the results of the subtasks, determine if the task is complete.\n"
-        f"If it is, respond with 'COMPLETE'.\n"
-        f"If more subtasks are needed, respond with 'MORE_SUBTASKS: ' followed by the new subtasks, each on a new line starting with 'TEXT: ' or 'COMMAND: '.\n"
-        f"If you need clarification from the user, respond with 'QUESTION: ' followed by the question.\n"
+        f"If it is, use status \"complete\". If more subtasks are needed, use status \"more\" and list them.\n"
+        f"If you need clarification from the user, use status \"question\" and ask it.\n"
+        f"{PLAN_FORMAT}\n"
         f"Task: {task}\n"
         f"Subtask results:\n{results_str}"
     )
@@ -209,28 +1354,17 @@ def check_completion():
         "frequency_penalty": frequency_penalty
     }
     try:
-        response = requests.post(TEXT_ENDPOINT, json=payload, headers=headers)
+        response = post_upstream(TEXT_ENDPOINT, payload, headers, coalesce="check_completion")
         if response.status_code == 200:
             check_result = response.json()["choices"][0]["message"]["content"].strip()
-            check_result = check_result.strip()  # Normalize response
-            if check_result.upper().startswith("COMPLETE"):
-                return jsonify({"complete": True})
-            elif check_result.upper().startswith("MORE_SUBTASKS:"):
-                more_subtasks_text = check_result[len("MORE_SUBTASKS:"):].strip()
-                subtasks = []
-                for line in more_subtasks_text.split('\n'):
-                    line = line.strip()
-                    if line.startswith("TEXT:"):
-                        subtasks.append({"type": "text", "content": line[5:].strip()})
-                    elif line.startswith("COMMAND:"):
-                        subtasks.append({"type": "command", "content": line[8:].strip()})
-                return jsonify({"subtasks": subtasks})
-            elif check_result.upper().startswith("QUESTION:"):
-                question = check_result[len("QUESTION:"):].strip()
-                return jsonify({"question": question})
-            else:
-                app.logger.error(f"Invalid response from API: {check_result}")
+            plan = read_plan(check_result, headers, model, "check_completion")
+            if plan is None:
                 return jsonify({"error": "Invalid response from API"}), 500
+            if plan["status"] == "complete":
+                return jsonify({"complete": True})
+            elif plan["status"] == "question":
+                return jsonify({"question": plan["question"]})
+            return jsonify({"subtasks": plan["subtasks"]})
         else:
             return jsonify({"error": f"API error: {response.text}"}), 500
     except Exception as e:
@@ -243,14 +1377,211 @@ def save_message_route():
     session_id = session.get("session_id")
     role = data.get("role", "user")
     content = data.get("content", "")
-    save_message(session_id, role, content)
-    return jsonify({"success": True})
+    inserted = save_message(session_id, role, content, data.get("message_id"))
+    return jsonify({"success": True, "duplicate": not inserted})
 
 @app.route("/")
 def index():
     if "session_id" not in session:
         session["session_id"] = str(uuid.uuid4())
-    return render_template_string(INDEX_HTML)
+    # The page is rendered once at startup; browsers revalidate it with its ETag
+    return send_precompressed(index_page, "no-cache")
+
+# Text turns are split into prepare/complete so /chat and the streaming channel share them.
+# prepare_text_turn stores the user message and builds the upstream payload; "reply" is set
+# instead when the turn can be answered without calling upstream.
+def text_payload(data, messages):
+    model = data.get("model", "llama-3.3-70b")
+    venice_params = data.get("venice_params", "")
+    if venice_params:
+        model += ":" + venice_params
+    return {
+        "model": model,
+        "messages": messages,
+        "temperature": data.get("temperature", 0.7),
+        "top_p": data.get("top_p", 0.9),
+        "max_tokens": data.get("max_tokens", 7000),
+        "presence_penalty": data.get("presence_penalty", 1),
+        "frequency_penalty": data.get("frequency_penalty", 0.9)
+    }
+
+def image_payload(data):
+    payload = {
+        "model": data.get("model", "fluently-xl"),
+        "prompt": data.get("prompt", data.get("message", "")),
+        "height": data.get("image_height", 1024),
+        "width": data.get("image_width", 1024),
+        "steps": data.get("steps", 20),
+        "return_binary": False,
+        "hide_watermark": data.get("hide_watermark", False),
+        "format": data.get("format", "png"),
+        "safe_mode": False,
+        "embed_exif_metadata": data.get("embed_exif_metadata", False),
+        "negative_prompt": data.get("negative_prompt", ""),
+        "cfg_scale": data.get("cfg_scale", 7.5),
+        "lora_strength": data.get("lora_strength", 50)
+    }
+    seed_value = str(data.get("seed", ""))
+    if seed_value.strip() != "":
+        payload["seed"] = int(seed_value)
+    if "inpaint" in data:
+        payload["inpaint"] = data["inpaint"]
+    return payload
+
+# Returns a data URL for every image in the response, or a single "Error: ..." string
+def image_urls_from_response(response, payload):
+    if response.status_code != 200:
+        return [f"Error {response.status_code}: {response.text}"]
+    response_data = response.json()
+    image_data = response_data.get("image") or response_data.get("images")
+    images = [image.strip() for image in image_data if image] if isinstance(image_data, list) else [image_data]
+    if not any(images):
+        error_message = response_data.get("error", "No image data returned")
+        return [f"Error: {error_message}"]
+    fmt = payload.get("format", "png").lower()
+    mime_map = {"png": "image/png", "webp": "image/webp", "jpg": "image/jpeg"}
+    mime = mime_map.get(fmt, "image/png")
+    return ["data:" + mime + ";base64," + image for image in images]
+
+def image_url_from_response(response, payload):
+    return image_urls_from_response(response, payload)[0]
+
+# Image variants: "variants" in an image request expands one prompt into several generations.
+# Each key is an axis ("seeds", "cfg_scale", "steps", "styles" lists, or "seed_count" random seeds);
+# several axes form a grid. Variants run concurrently and each image is sent as soon as it is ready.
+IMAGE_MAX_VARIANTS = 16
+IMAGE_VARIANT_CONCURRENCY = int(os.getenv("VENICE_IMAGE_CONCURRENCY", "4"))
+image_pool = ThreadPoolExecutor(max_workers=IMAGE_VARIANT_CONCURRENCY * 4)
+
+def variant_axis(spec, name):
+    # At most IMAGE_MAX_VARIANTS values per axis, since no more than that are ever generated
+    values = spec.get(name) or []
+    if not isinstance(values, list):
+        raise ValueError(f"variants.{name} must be a list")
+    return values[:IMAGE_MAX_VARIANTS]
+
+def expand_image_variants(data):
+    # Raises ValueError for a malformed spec, so callers can answer 400 before streaming starts
+    spec = data.get("variants") or {}
+    if not isinstance(spec, dict):
+        raise ValueError("variants must be an object")
+    axes = []
+    try:
+        seeds = [int(seed) for seed in variant_axis(spec, "seeds")]
+        if spec.get("seed_count"):
+            count = min(int(spec["seed_count"]), IMAGE_MAX_VARIANTS)
+            seeds += [random.randint(0, 2 ** 31 - 1) for _ in range(count)]
+        if seeds:
+            axes.append([("seed", {"seed": seed}) for seed in seeds[:IMAGE_MAX_VARIANTS]])
+        if spec.get("cfg_scale"):
+            axes.append([("cfg " + str(value), {"cfg_scale": float(value)}) for value in variant_axis(spec, "cfg_scale")])
+        if spec.get("steps"):
+            axes.append([(str(value) + " steps", {"steps": int(value)}) for value in variant_axis(spec, "steps")])
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid variant value: {str(e)}")
+    if spec.get("styles"):
+        message = data.get("message", data.get("prompt", ""))
+        axes.append([(str(style), {"prompt": f"{message} in {style} style"}) for style in variant_axis(spec, "styles")])
+    variants = []
+    for combination in itertools.islice(itertools.product(*axes), IMAGE_MAX_VARIANTS):
+        overrides = {}
+        for _, values in combination:
+            overrides.update(values)
+        labels = [label if label != "seed" else f"seed {values['seed']}" for label, values in combination]
+        variants.append((", ".join(labels), overrides))
+    return variants
+
+def image_variant_events(data, headers, variants, trace=None):
+    # Yields {"type": "image", ...} per image in completion order, then {"type": "response", "body": gallery}.
+    # The workers have no request context, so the caller's trace is passed in.
+    finished = queue.Queue()
+
+    def work(index, label, overrides):
+        payload = image_payload(dict(data, **overrides))
+        start = time.time()
+        try:
+            response = post_upstream(IMAGE_ENDPOINT, payload, headers, coalesce="image" if "seed" in payload else None,
+                                     trace=trace)
+            urls = image_urls_from_response(response, payload)
+        except Exception as e:
+            urls = [f"Exception occurred: {str(e)}"]
+        record_metric("image.variants")
+        record_metric("image.variant_ms", round((time.time() - start) * 1000, 2))
+        finished.put((index, label, urls))
+
+    pending = deque(enumerate(variants))
+    gallery = []
+    inflight = 0
+    try:
+        while pending or inflight:
+            while pending and inflight < IMAGE_VARIANT_CONCURRENCY:
+                index, (label, overrides) = pending.popleft()
+                image_pool.submit(work, index, label, overrides)
+                inflight += 1
+            index, label, urls = finished.get()
+            inflight -= 1
+            for url in urls:
+                image = {"variant": index, "label": label, "image_url": url}
+                gallery.append(image)
+                yield dict(image, type="image")
+    finally:
+        pending.clear()
+    gallery.sort(key=lambda image: image["variant"])
+    yield {"type": "response", "body": {"images": gallery}}
+
+def prepare_text_turn(data, session_id):
+    message = data.get("message", "")
+    api_key = data.get("api_key", "")
+    system_prompt = data.get("system_prompt", "You are a helpful assistant.")
+    model = data.get("model", "llama-3.3-70b")
+    temperature = data.get("temperature", 0.7)
+    top_p = data.get("top_p", 0.9)
+    max_tokens = data.get("max_tokens", 7000)
+    presence_penalty = data.get("presence_penalty", 1)
+    frequency_penalty = data.get("frequency_penalty", 0.9)
+    venice_params = data.get("venice_params", "")
+    if venice_params:
+        model += ":" + venice_params
+    turn = {"message": message, "reply_id": data.get("reply_id"), "reply": None, "cached": False,
+            "cache_scope": None, "payload": None}
+    # The client assigns ids to both sides of the turn, so a retried request is stored once
+    if turn["reply_id"]:
+        stored_reply = get_session_message(session_id, turn["reply_id"])
+        if stored_reply is not None:
+            turn["reply"] = stored_reply
+            return turn
+    save_message(session_id, "user", message, data.get("message_id"))
+    history = get_relevant_history(session_id, message)
+    # History already ends with the message just saved unless another request interleaved
+    if not history or history[-1] != {"role": "user", "content": message}:
+        history.append({"role": "user", "content": message})
+    # Only first turns are served from the semantic cache; later replies depend on the conversation
+    if semantic_cache is not None and not any(msg["role"] == "assistant" for msg in history):
+        turn["cache_scope"] = semantic_scope(system_prompt, model)
+        cached_reply = semantic_cache.lookup(message, turn["cache_scope"])
+        record_metric("semantic_cache.hits" if cached_reply is not None else "semantic_cache.misses")
+        if cached_reply is not None:
+            save_message(session_id, "assistant", cached_reply, turn["reply_id"])
+            turn["reply"] = cached_reply
+            turn["cached"] = True
+            return turn
+    messages = [{"role": "system", "content": system_prompt}] + history
+    if estimate_tokens(messages) > TOKEN_THRESHOLD and len(history) > 2:
+        summary = summarize_history(history[:-1], api_key, model, top_p, max_tokens, presence_penalty, frequency_penalty)
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "assistant", "content": "Summary of previous conversation: " + summary},
+            {"role": "user", "content": message}
+        ]
+    turn["payload"] = text_payload(data, messages)
+    record_metric("chat.turns")
+    record_metric("chat.prompt_tokens", estimate_tokens(messages))
+    return turn
+
+def complete_text_turn(session_id, turn, reply, succeeded):
+    if succeeded and turn["cache_scope"] is not None:
+        semantic_cache.add(turn["message"], turn["cache_scope"], reply)
+    save_message(session_id, "assistant", reply, turn["reply_id"])
 
 @app.route("/chat", methods=["POST"])
 def chat():
@@ -271,96 +1602,37 @@ def chat():
         session_id = session["session_id"]
     
     if mode == "text":
-        message = data.get("message", "")
-        system_prompt = data.get("system_prompt", "You are a helpful assistant.")
-        model = data.get("model", "llama-3.3-70b")
-        temperature = data.get("temperature", 0.7)
-        top_p = data.get("top_p", 0.9)
-        max_tokens = data.get("max_tokens", 7000)
-        presence_penalty = data.get("presence_penalty", 1)
-        frequency_penalty = data.get("frequency_penalty", 0.9)
-        venice_params = data.get("venice_params", "")
-        if venice_params:
-            model += ":" + venice_params
-        save_message(session_id, "user", message)
-        history = get_recent_history(session_id)
-        messages = [{"role": "system", "content": system_prompt}] + history + [{"role": "user", "content": message}]
-        if estimate_tokens(messages) > TOKEN_THRESHOLD and len(history) > 1:
-            summary = summarize_history(history, api_key, model, top_p, max_tokens, presence_penalty, frequency_penalty)
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "assistant", "content": "Summary of previous conversation: " + summary},
-                {"role": "user", "content": message}
-            ]
-        payload = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature,
-            "top_p": top_p,
-            "max_tokens": max_tokens,
-            "presence_penalty": presence_penalty,
-            "frequency_penalty": frequency_penalty
-        }
+        turn = prepare_text_turn(data, session_id)
+        if turn["reply"] is not None:
+            return jsonify({"reply": turn["reply"], "cached": turn["cached"]})
+        succeeded = False
         try:
-            response = requests.post(TEXT_ENDPOINT, json=payload, headers=headers)
+            response = post_upstream(TEXT_ENDPOINT, turn["payload"], headers, coalesce="chat")
             if response.status_code == 200:
                 reply = response.json()["choices"][0]["message"]["content"].strip()
+                succeeded = True
             else:
                 reply = f"Error {response.status_code}: {response.text}"
         except Exception as e:
             reply = f"Exception occurred: {str(e)}"
-        save_message(session_id, "assistant", reply)
+        complete_text_turn(session_id, turn, reply, succeeded)
         return jsonify({"reply": reply})
     
+    elif mode == "image" and data.get("variants"):
+        try:
+            variants = expand_image_variants(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        events = (json.dumps(event) + "\n" for event in image_variant_events(data, headers, variants, g.get("trace")))
+        return Response(events, mimetype="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
     elif mode == "image":
-        prompt = data.get("prompt", data.get("message", ""))
-        model = data.get("model", "fluently-xl")
-        height = data.get("image_height", 1024)
-        width = data.get("image_width", 1024)
-        steps = data.get("steps", 20)
-        hide_watermark = data.get("hide_watermark", False)
-        embed_exif = data.get("embed_exif_metadata", False)
-        negative_prompt = data.get("negative_prompt", "")
-        cfg_scale = data.get("cfg_scale", 7.5)
-        lora_strength = data.get("lora_strength", 50)
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "height": height,
-            "width": width,
-            "steps": steps,
-            "return_binary": False,
-            "hide_watermark": hide_watermark,
-            "format": data.get("format", "png"),
-            "safe_mode": False,
-            "embed_exif_metadata": embed_exif,
-            "negative_prompt": negative_prompt,
-            "cfg_scale": cfg_scale,
-            "lora_strength": lora_strength
-        }
-        seed_value = data.get("seed", "")
-        if seed_value.strip() != "":
-            payload["seed"] = int(seed_value)
-        if "inpaint" in data:
-            payload["inpaint"] = data["inpaint"]
+        payload = image_payload(data)
         try:
-            response = requests.post(IMAGE_ENDPOINT, json=payload, headers=headers)
-            if response.status_code == 200:
-                response_data = response.json()
-                image_data = response_data.get("image") or response_data.get("images")
-                if isinstance(image_data, list):
-                    image_data = image_data[0].strip()
-                if image_data:
-                    fmt = payload.get("format", "png").lower()
-                    mime_map = {"png": "image/png", "webp": "image/webp", "jpg": "image/jpeg"}
-                    mime = mime_map.get(fmt, "image/png")
-                    image_url = "data:" + mime + ";base64," + image_data
-                else:
-                    error_message = response_data.get("error", "No image data returned")
-                    image_url = f"Error: {error_message}"
-                return jsonify({"image_url": image_url})
-            else:
-                return jsonify({"image_url": f"Error {response.status_code}: {response.text}"})
+            # Seeded generations are deterministic, so identical concurrent requests can share one call
+            response = post_upstream(IMAGE_ENDPOINT, payload, headers, coalesce="image" if "seed" in payload else None)
+            image_urls = image_urls_from_response(response, payload)
+            return jsonify({"image_url": image_urls[0], "image_urls": image_urls})
         except Exception as e:
             return jsonify({"image_url": f"Exception occurred: {str(e)}"})
     
@@ -393,9 +1665,9 @@ def process_agent_task(task, api_key, model, temperature, top_p, max_tokens, pre
             headers["Authorization"] = f"Bearer {default_key}"
     
     decomposition_prompt = (
-        f"Decompose the following high-level task into a numbered list of actionable subtasks:\n"
-        f"Task: {task}\n"
-        f"Provide one subtask per line in the format 'N. subtask description'"
+        f"Decompose the following high-level task into a list of actionable subtasks, with status \"more\".\n"
+        f"{PLAN_FORMAT}\n"
+        f"Task: {task}"
     )
     payload = {
         "model": model,
@@ -410,7 +1682,7 @@ def process_agent_task(task, api_key, model, temperature, top_p, max_tokens, pre
         "frequency_penalty": frequency_penalty
     }
     try:
-        response = requests.post(TEXT_ENDPOINT, json=payload, headers=headers)
+        response = post_upstream(TEXT_ENDPOINT, payload, headers)
         if response.status_code == 200:
             decomposition = response.json()["choices"][0]["message"]["content"].strip()
         else:
@@ -418,41 +1690,25 @@ def process_agent_task(task, api_key, model, temperature, top_p, max_tokens, pre
     except Exception as e:
         return f"Exception during task decomposition: {str(e)}"
     
-    subtasks = re.findall(r'\d+\.\s*(.+)', decomposition)
-    if not subtasks:
-        subtasks = [decomposition]
+    record_metric("agent.jobs")
+    plan = read_plan(decomposition, headers, model, "process_agent_task")
+    if plan is None or not plan["subtasks"]:
+        return "Error decomposing task: could not read subtasks from the model's reply"
+    subtasks = [item["content"] for item in plan["subtasks"]]
     
     results = []
-    for subtask in subtasks:
-        subtask = subtask.strip()
-        if subtask.upper().startswith("RUN COMMAND:"):
-            command = subtask[len("RUN COMMAND:"):].strip()
+    for item in plan["subtasks"]:
+        subtask = item["content"]
+        if item["type"] == "command":
+            command = subtask
             if auto_execute:
                 result = run_terminal_command(command)
             else:
                 result = f"Auto-execution disabled. Command '{command}' not run."
             results.append({"subtask": subtask, "result": result})
         else:
-            sub_payload = {
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": "You are now executing a subtask as part of a larger agent workflow."},
-                    {"role": "user", "content": subtask}
-                ],
-                "temperature": temperature,
-                "top_p": top_p,
-                "max_tokens": max_tokens,
-                "presence_penalty": presence_penalty,
-                "frequency_penalty": frequency_penalty
-            }
-            try:
-                sub_resp = requests.post(TEXT_ENDPOINT, json=sub_payload, headers=headers)
-                if sub_resp.status_code == 200:
-                    sub_result = sub_resp.json()["choices"][0]["message"]["content"].strip()
-                else:
-                    sub_result = f"Error: {sub_resp.text}"
-            except Exception as e:
-                sub_result = f"Exception: {str(e)}"
+            sub_result = run_subtask(task, subtask, results, headers, model, temperature, top_p,
+                                     max_tokens, presence_penalty, frequency_penalty)["reply"]
             results.append({"subtask": subtask, "result": sub_result})
     
     reply = "Agent Task Decomposition and Execution Results:\n\n"
@@ -461,200 +1717,1308 @@ def process_agent_task(task, api_key, model, temperature, top_p, max_tokens, pre
         reply += f"Result for subtask {idx}:\n{res['result']}\n\n"
     return reply
 
-@app.route("/execute", methods=["POST"])
-def execute_command():
-    data = request.json
-    command = data.get("command", "")
-    approved = data.get("approved", False)
-    output = run_terminal_command(command, approved)
-    return jsonify({'output': output})
+# Ephemeral subtask execution: the prompt holds only the subtask plus its own job's context,
+# bounded by SUBTASK_CONTEXT_TOKENS, and nothing is read from or written to conversation history
+SUBTASK_CONTEXT_TOKENS = 1500  # Rough word budget, same unit as estimate_tokens
 
-@app.route("/new_chat", methods=["POST"])
-def new_chat():
+def build_subtask_context(task, results, budget=SUBTASK_CONTEXT_TOKENS):
+    lines = []
+    # The task takes at most half the budget, the rest goes to earlier results
+    task_words = task.split(" ")
+    if len(task_words) > budget // 2:
+        task_words = task_words[:budget // 2] + ["[truncated]"]
+    task = " ".join(task_words)
+    remaining = budget - len(task_words)
+    # Most recent results are the most useful, so fill the budget from the end
+    for res in reversed(results):
+        words = f"Subtask: {res.get('subtask', '')}\nResult: {res.get('result', '')}".split(" ")
+        if remaining <= 0:
+            break
+        if len(words) > remaining:
+            words = words[:remaining] + ["[truncated]"]
+        lines.append(" ".join(words))
+        remaining -= len(words)
+    lines.reverse()
+    context = f"Overall task: {task}"
+    if lines:
+        context += "\nResults of earlier subtasks:\n" + "\n\n".join(lines)
+    return context
+
+def run_subtask(task, subtask, results, headers, model, temperature, top_p, max_tokens, presence_penalty, frequency_penalty):
+    messages = [
+        {"role": "system", "content": "You are now executing a subtask as part of a larger agent workflow."},
+        {"role": "user", "content": build_subtask_context(task, results) + f"\n\nCurrent subtask: {subtask}"}
+    ]
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "top_p": top_p,
+        "max_tokens": max_tokens,
+        "presence_penalty": presence_penalty,
+        "frequency_penalty": frequency_penalty
+    }
+    prompt_tokens = estimate_tokens(messages)
+    completion_tokens = 0
+    start = time.time()
+    try:
+        response = post_upstream(TEXT_ENDPOINT, payload, headers)
+        if response.status_code == 200:
+            response_data = response.json()
+            reply = response_data["choices"][0]["message"]["content"].strip()
+            # Prefer the upstream's own token counts when it reports them
+            usage = response_data.get("usage") or {}
+            prompt_tokens = usage.get("prompt_tokens", prompt_tokens)
+            completion_tokens = usage.get("completion_tokens", len(reply.split()))
+        else:
+            reply = f"Error: {response.text}"
+    except Exception as e:
+        reply = f"Exception: {str(e)}"
+    latency_ms = round((time.time() - start) * 1000, 2)
+    record_metric("subtask.count")
+    record_metric("subtask.latency_ms", latency_ms)
+    record_metric("subtask.prompt_tokens", prompt_tokens)
+    record_metric("subtask.completion_tokens", completion_tokens)
+    app.logger.info(f"Subtask finished in {latency_ms} ms ({prompt_tokens} prompt / {completion_tokens} completion tokens)")
+    return {"reply": reply, "latency_ms": latency_ms, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+@app.route("/execute_subtask", methods=["POST"])
+def execute_subtask():
     data = request.json
-    keep_history = data.get("keep_history", False)
-    session_id = session.get("session_id")
-    if not keep_history and session_id:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("DELETE FROM messages WHERE session_id=?", (session_id,))
-        conn.commit()
-        conn.close()
-    return jsonify({"success": True})
+    api_key = data.get("api_key", "")
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    else:
+        default_key = os.getenv("VENICE_API_KEY")
+        if default_key:
+            headers["Authorization"] = f"Bearer {default_key}"
+    results = data.get("results") or []
+    if not isinstance(results, list) or not all(isinstance(res, dict) for res in results):
+        return jsonify({"error": "results must be a list of {\"subtask\", \"result\"} objects"}), 400
+    result = run_subtask(
+        str(data.get("task", "")),
+        data.get("subtask", ""),
+        results,
+        headers,
+        data.get("model", "deepseek-r1-671b"),
+        data.get("temperature", 0.7),
+        data.get("top_p", 0.9),
+        data.get("max_tokens", 7000),
+        data.get("presence_penalty", 1),
+        data.get("frequency_penalty", 0.9)
+    )
+    return jsonify(result)
 
-INDEX_HTML = '''
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>Venice Chat App</title>
-    <script src="https://cdn.jsdelivr.net/npm/marked/marked.min.js"></script>
-    <style>
-        html, body {
-            margin: 0; padding: 0;
-            height: 100%; width: 100%;
-            font-family: Arial, sans-serif;
-        }
-        body.dark-mode {
-            background-color: #2c2c2c;
-            color: #ccc;
-        }
-        body.light-mode {
-            background-color: #f7f7f7;
-            color: #000;
-        }
-        .container {
-            width: 100%; height: 100%;
-            display: flex; flex-direction: column;
-            align-items: center;
-            box-sizing: border-box;
-            padding: 10px;
-        }
-        h1 { text-align: center; }
-        .chat-container {
-            width: 100%; max-width: 800px;
-            flex: 1;
-            border: 1px solid #444;
-            border-radius: 8px;
-            background: inherit;
-            padding: 20px;
-            overflow-y: auto;
-            display: flex;
-            flex-direction: column;
-            gap: 10px;
-        }
-        body.light-mode .message.user {
-            align-self: flex-end;
-            background-color: #dcf8c6;
-            color: #000;
-            border: 1px solid #aaa;
-        }
-        body.light-mode .message.assistant {
-            align-self: flex-start;
-            background-color: #fff;
-            color: #000;
-            border: 1px solid #aaa;
-        }
-        body.dark-mode .message.user {
-            align-self: flex-end;
-            background-color: #0056b3;
-            color: #fff;
-            border: 1px solid #007bff;
-        }
-        body.dark-mode .message.assistant {
-            align-self: flex-start;
-            background-color: #444;
-            color: #fff;
-            border: 1px solid #666;
-        }
-        .message {
-            max-width: 70%;
-            padding: 10px 15px;
-            border-radius: 15px;
-            line-height: 1.5;
-            word-wrap: break-word;
-        }
-        .input-container {
-            width: 100%; max-width: 800px;
-            display: flex; margin-top: 20px;
-        }
-        .input-container input {
-            flex: 1; padding: 10px;
-            border-radius: 4px; border: 1px solid #777;
-        }
-        .input-container button {
-            padding: 10px 20px; margin-left: 10px;
-            border: none; background: #007bff; color: #fff;
-            border-radius: 4px; cursor: pointer;
-        }
-        .mode-buttons {
-            margin-top: 10px;
-            display: flex;
-            justify-content: center;
-            gap: 20px;
-        }
-        .mode-buttons button {
-            padding: 10px 20px;
-            border: none;
-            background: #28a745;
-            color: #fff;
-            border-radius: 4px;
-            cursor: pointer;
-        }
-        .settings {
-            width: 100%; max-width: 800px;
-            margin-top: 20px;
-            border: 1px solid #444; border-radius: 8px;
-            background: inherit; padding: 10px;
-            display: none;
-            text-align: left;
-        }
-        .settings label { font-weight: bold; }
-        .settings input, .settings select, .settings textarea {
-            width: 100%; padding: 5px; margin: 5px 0 10px 0;
-            border: 1px solid #777; border-radius: 4px;
-            background: inherit; color: inherit;
-        }
-        .toggle-settings {
-            margin-top: 10px;
-            cursor: pointer;
-            color: #007bff; text-decoration: underline;
-        }
-        .mode-settings { display: none; }
-        .blinking-cursor {
-            font-weight: 100;
-            font-size: 1em;
-            color: #ccc;
-            -webkit-animation: 1s blink step-end infinite;
-            animation: 1s blink step-end infinite;
-        }
-        @keyframes blink {
-            from, to { border-right-color: transparent; }
-            50% { border-right-color: #ccc; }
-        }
-        @-webkit-keyframes blink {
-            from, to { border-right-color: transparent; }
-            50% { border-right-color: #ccc; }
-        }
-        pre {
-            background-color: #333;
-            color: #eee;
-            padding: 10px;
-            border-radius: 4px;
-            position: relative;
-            overflow-x: auto;
-        }
-        code {
-            font-family: Consolas, "Courier New", monospace;
-        }
-        .copy-button {
-            position: absolute;
-            top: 5px; right: 5px;
-            padding: 2px 6px;
-            font-size: 0.8em;
-            cursor: pointer;
-            background: #007bff;
-            border: none;
-            border-radius: 3px;
-            color: #fff;
-        }
-        #preview-container {
-            width: 100%; max-width: 800px;
-            margin-top: 10px;
-            border: 1px solid #444;
-            border-radius: 4px;
-            padding: 10px;
-            min-height: 50px;
-            background: inherit;
-            color: inherit;
-        }
-    </style>
+# Batch inference: many independent prompts, run concurrently without touching conversation history.
+# Successful results are stored per batch_id so a batch that was cut off can be posted again to resume.
+# A hash of the prompts is stored with the batch_id, so a different batch can't reuse its results.
+BATCH_MAX_PROMPTS = 10000
+BATCH_CONCURRENCY = int(os.getenv("VENICE_BATCH_CONCURRENCY", "16"))
+BATCH_REQUESTS_PER_MINUTE = int(os.getenv("VENICE_BATCH_RPM", "0"))  # Client-side quota; 0 = only back off on 429
+BATCH_MAX_ATTEMPTS = 5  # Failed calls per prompt; 429s don't count
+BATCH_MAX_RATE_LIMIT_WAIT = 300  # Seconds a prompt may keep waiting on 429s before it is reported as failed
+batch_pool = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY)
+
+class RateLimiter:
+    # Spaces calls evenly to stay under a per-minute quota. The spacing adapts to the upstream:
+    # it grows on every 429 (which also pauses every caller) and shrinks back on each success.
+    def __init__(self, per_minute):
+        self.min_interval = 60.0 / per_minute if per_minute else 0
+        self.interval = self.min_interval
+        self.next_slot = 0
+        self.throttled_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.time()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def throttle(self, seconds):
+        with self.lock:
+            now = time.time()
+            if now >= self.throttled_until:  # Calls already in flight during a pause don't slow it further
+                self.interval = min(max(self.interval * 1.5, 0.01), 10)
+            self.throttled_until = max(self.throttled_until, now + seconds)
+            self.next_slot = max(self.next_slot, now + seconds)
+
+    def succeeded(self):
+        with self.lock:
+            self.interval = max(self.interval * 0.98, self.min_interval)
+
+batch_limiter = RateLimiter(BATCH_REQUESTS_PER_MINUTE)
+
+def init_batch_db(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''CREATE TABLE IF NOT EXISTS batch_results (
+        batch_id TEXT,
+        idx INTEGER,
+        result TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (batch_id, idx)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS batches (
+        batch_id TEXT PRIMARY KEY,
+        items_hash TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )''')
+    conn.commit()
+    conn.close()
+
+for shard_path in storage.paths():
+    init_batch_db(shard_path)
+
+def register_batch(batch_id, items_hash):
+    # Returns False when batch_id already belongs to a batch with different items
+    conn = sqlite3.connect(storage.path_for(batch_id))
+    conn.execute("INSERT OR IGNORE INTO batches (batch_id, items_hash) VALUES (?, ?)", (batch_id, items_hash))
+    conn.commit()
+    row = conn.execute("SELECT items_hash FROM batches WHERE batch_id=?", (batch_id,)).fetchone()
+    conn.close()
+    return row[0] == items_hash
+
+def load_batch_results(batch_id):
+    conn = sqlite3.connect(storage.path_for(batch_id))
+    c = conn.cursor()
+    c.execute("SELECT idx, result FROM batch_results WHERE batch_id=?", (batch_id,))
+    rows = {idx: json.loads(result) for idx, result in c.fetchall()}
+    conn.close()
+    return rows
+
+def save_batch_result(batch_id, result):
+    conn = sqlite3.connect(storage.path_for(batch_id))
+    conn.execute("INSERT OR REPLACE INTO batch_results (batch_id, idx, result) VALUES (?, ?, ?)",
+                 (batch_id, result["index"], json.dumps(result)))
+    conn.commit()
+    conn.close()
+
+def run_batch_item(index, item, headers):
+    mode = item.get("mode", "text")
+    if mode == "image":
+        endpoint, payload = IMAGE_ENDPOINT, image_payload(item)
+    else:
+        messages = [{"role": "user", "content": item.get("message", "")}]
+        if item.get("system_prompt"):
+            messages.insert(0, {"role": "system", "content": item["system_prompt"]})
+        endpoint, payload = TEXT_ENDPOINT, text_payload(item, messages)
+    result = {"index": index, "mode": mode}
+    start = time.time()
+    attempt = calls = 0
+    while attempt < BATCH_MAX_ATTEMPTS and time.time() - start < BATCH_MAX_RATE_LIMIT_WAIT:
+        batch_limiter.acquire()
+        calls += 1
+        try:
+            response = post_upstream(endpoint, payload, headers)
+        except Exception as e:
+            attempt += 1
+            result["error"] = f"Exception occurred: {str(e)}"
+            time.sleep(min(2 ** attempt, 30))
+            continue
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get("Retry-After", "")
+            delay = float(retry_after) if retry_after.replace(".", "", 1).isdigit() else min(2 ** (attempt + 1), 30)
+            if response.status_code == 429:
+                batch_limiter.throttle(delay)  # The quota is shared, so every worker slows down
+                record_metric("batch.rate_limited")
+            else:
+                attempt += 1
+                time.sleep(delay)
+            result["error"] = f"Error {response.status_code}: {response.text}"
+            continue
+        result.pop("error", None)
+        batch_limiter.succeeded()
+        if mode == "image":
+            image_url = image_url_from_response(response, payload)
+            if image_url.startswith("data:"):
+                result["image_url"] = image_url
+            else:
+                result["error"] = image_url
+        elif response.status_code == 200:
+            result["reply"] = response.json()["choices"][0]["message"]["content"].strip()
+        else:
+            result["error"] = f"Error {response.status_code}: {response.text}"
+        break
+    result["attempts"] = calls
+    result["duration_ms"] = round((time.time() - start) * 1000, 2)
+    record_metric("batch.items")
+    record_metric("batch.failed" if "error" in result else "batch.succeeded")
+    return result
+
+# Body: {"prompts": [text or {"message"/"prompt", "mode", ...overrides}], "defaults": {...}, "batch_id": optional}.
+# Streams NDJSON: a header line, one line per prompt in completion order with its original index, then a summary.
+@app.route("/batch", methods=["POST"])
+def batch():
+    data = request.json
+    prompts = data.get("prompts", [])
+    if not isinstance(prompts, list) or not prompts:
+        return jsonify({"error": "prompts must be a non-empty list"}), 400
+    if len(prompts) > BATCH_MAX_PROMPTS:
+        return jsonify({"error": f"At most {BATCH_MAX_PROMPTS} prompts per batch"}), 400
+    defaults = data.get("defaults", {})
+    if not isinstance(defaults, dict):
+        return jsonify({"error": "defaults must be an object"}), 400
+    items = [dict(defaults, **(prompt if isinstance(prompt, dict) else {"message": prompt})) for prompt in prompts]
+    batch_id = data.get("batch_id") or str(uuid.uuid4())
+    # The API key is left out of the hash so a batch can be resumed with a rotated key
+    items_hash = payload_hash([{k: v for k, v in item.items() if k != "api_key"} for item in items])
+    if not register_batch(batch_id, items_hash):
+        return jsonify({"error": "batch_id belongs to a batch with different prompts"}), 409
+    headers = upstream_headers(defaults.get("api_key", data.get("api_key", "")))
+    done = load_batch_results(batch_id)
+    pending = deque(index for index in range(len(items)) if index not in done)
+
+    def generate():
+        yield json.dumps({"batch_id": batch_id, "total": len(items), "resumed": len(done)}) + "\n"
+        counts = {"succeeded": len(done), "failed": 0}
+        for index in sorted(done):
+            yield json.dumps(dict(done[index], resumed=True)) + "\n"
+        finished = queue.Queue()
+
+        def work(index):
+            try:
+                result = run_batch_item(index, items[index], headers)
+            except Exception as e:
+                result = {"index": index, "error": f"Exception occurred: {str(e)}"}
+            if "error" not in result:
+                save_batch_result(batch_id, result)
+            finished.put(result)
+
+        # Keep only BATCH_CONCURRENCY items in flight, so a dropped client stops the batch promptly
+        inflight = 0
+        try:
+            while pending or inflight:
+                while pending and inflight < BATCH_CONCURRENCY:
+                    batch_pool.submit(work, pending.popleft())
+                    inflight += 1
+                result = finished.get()
+                inflight -= 1
+                counts["failed" if "error" in result else "succeeded"] += 1
+                yield json.dumps(result) + "\n"
+        finally:
+            pending.clear()
+        yield json.dumps({"done": True, "batch_id": batch_id, **counts}) + "\n"
+
+    record_metric("batch.requests")
+    return Response(generate(), mimetype="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+# With "async": true the command is only started; poll /execute/<id>, read its live output
+# from /execute/<id>/stream, or stop it with /execute/<id>/cancel
+@app.route("/execute", methods=["POST"])
+def execute_command():
+    data = request.json
+    command = data.get("command", "")
+    approved = data.get("approved", False)
+    timeout = data.get("timeout", COMMAND_TIMEOUT)
+    try:
+        run, refusal = start_command(command, approved, timeout, session.get("session_id"))
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    if run is None:
+        return jsonify({'output': refusal})
+    if data.get("async"):
+        return jsonify({"command_id": run.id, "status": run.status})
+    run.done.wait()
+    snapshot = run.snapshot()
+    return jsonify({'output': snapshot["output"], "exit_code": snapshot["exit_code"], "duration_ms": snapshot["duration_ms"]})
+
+def find_command_run(command_id):
+    with command_runs_lock:
+        run = command_runs.get(command_id)
+    if run is None or run.session_id != session.get("session_id"):
+        return None
+    return run
+
+@app.route("/execute/<command_id>")
+def command_status(command_id):
+    run = find_command_run(command_id)
+    if run is None:
+        return jsonify({"error": "Unknown command"}), 404
+    return jsonify(run.snapshot())
+
+@app.route("/execute/<command_id>/cancel", methods=["POST"])
+def cancel_command(command_id):
+    run = find_command_run(command_id)
+    if run is None:
+        return jsonify({"error": "Unknown command"}), 404
+    run.cancel()
+    return jsonify({"command_id": run.id, "status": run.status})
+
+@app.route("/execute/<command_id>/stream")
+def stream_command(command_id):
+    run = find_command_run(command_id)
+    if run is None:
+        return jsonify({"error": "Unknown command"}), 404
+
+    def generate():
+        last = 0
+        while True:
+            with run.changed:
+                while run.seq == last and not run.done.is_set():
+                    run.changed.wait()
+                pending = [chunk for chunk in run.chunks if chunk[0] > last]
+                finished = run.done.is_set()
+            if pending and pending[0][0] > last + 1:
+                yield json.dumps({"skipped": pending[0][0] - last - 1}) + "\n"
+            for seq, stream, text in pending:
+                yield json.dumps({"stream": stream, "text": text}) + "\n"
+                last = seq
+            if finished and last == run.seq:
+                snapshot = run.snapshot()
+                yield json.dumps({"done": True, "status": snapshot["status"], "exit_code": snapshot["exit_code"],
+                                  "duration_ms": snapshot["duration_ms"], "output": snapshot["output"]}) + "\n"
+                return
+
+    return Response(generate(), mimetype="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+# Paginated history resume: keyset pagination on (session_id, id), newest page first.
+# Image data URLs are replaced by links to /message_image so pages stay small.
+HISTORY_PAGE_SIZE = 50
+MAX_MESSAGE_ID = 2 ** 63 - 1
+
+@app.route("/history")
+def history():
+    session_id = session.get("session_id")
+    before = request.args.get("before", MAX_MESSAGE_ID, type=int)
+    limit = min(max(request.args.get("limit", HISTORY_PAGE_SIZE, type=int), 1), 200)
+    conn = open_db(storage.path_for(session_id))
+    c = conn.cursor()
+    # Cheap fingerprint of the page from the (session_id, id) indexes, checked before loading any content
+    c.execute("SELECT COUNT(*), MIN(id), MAX(id), TOTAL(id) FROM (SELECT id FROM all_messages "
+              "WHERE session_id=? AND id < ? ORDER BY id DESC LIMIT ?)", (str(session_id), before, limit))
+    etag = payload_hash([session_id, before, limit] + list(c.fetchone()))[:32]
+    if request.if_none_match.contains(etag):
+        conn.close()
+        response = Response(status=304)
+    else:
+        c.execute("SELECT id, role, content, timestamp FROM all_messages WHERE session_id=? AND id < ? "
+                  "ORDER BY id DESC LIMIT ?", (str(session_id), before, limit))
+        rows = c.fetchall()
+        conn.close()
+        rows.reverse()  # Reverse to chronological order
+        messages = []
+        for row_id, role, content, timestamp in rows:
+            message = {"id": row_id, "role": role, "content": content, "timestamp": timestamp}
+            if content.startswith(IMAGE_MESSAGE_PREFIX):
+                message["content"] = ""
+                message["image_url"] = f"/message_image/{row_id}"
+            messages.append(message)
+        next_before = rows[0][0] if len(rows) == limit else None
+        response = jsonify({"messages": messages, "next_before": next_before})
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+# Stored images are addressed by row id (history) or by the client's message id (just generated).
+# ?w=<width> returns a thumbnail, WebP when the browser accepts it and progressive JPEG otherwise.
+THUMBNAIL_WIDTHS = (256, 512)
+THUMBNAIL_QUALITY = 80
+
+@app.route("/message_image/<int:row_id>")
+def message_image(row_id):
+    return send_message_image("id", row_id)
+
+@app.route("/message_image/m/<message_id>")
+def message_image_by_message_id(message_id):
+    return send_message_image("message_id", message_id)
+
+def send_message_image(column, value):
+    session_id = str(session.get("session_id"))
+    db_path = storage.path_for(session_id)
+    conn = open_db(db_path)
+    c = conn.cursor()
+    c.execute(f"SELECT id, content FROM all_messages WHERE {column}=? AND session_id=?", (value, session_id))
+    row = c.fetchone()
+    conn.close()
+    if not row or not row[1].startswith(IMAGE_MESSAGE_PREFIX):
+        return jsonify({"error": "Image not found"}), 404
+    header, image_data = row[1][len("Image generated: "):].split(",", 1)
+    mime = header[len("data:"):].split(";")[0]
+    width = request.args.get("w", type=int)
+    if width and Image is not None:
+        width = min([w for w in THUMBNAIL_WIDTHS if w >= width] or [THUMBNAIL_WIDTHS[-1]])
+        fmt = "webp" if request.accept_mimetypes["image/webp"] else "jpeg"
+        thumbnail = get_thumbnail(db_path, row[0], image_data, width, fmt)
+        if thumbnail is not None:
+            response = Response(thumbnail, mimetype="image/" + fmt)
+            response.vary.add("Accept")
+            response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+            return response
+    response = Response(base64.b64decode(image_data), mimetype=mime)
+    response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
+
+def get_thumbnail(db_path, image_id, image_data, width, fmt):
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute("SELECT data FROM image_thumbnails WHERE image_id=? AND width=? AND format=?", (image_id, width, fmt))
+    row = c.fetchone()
+    if row:
+        conn.close()
+        record_metric("thumbnail.hits")
+        return row[0]
+    start = time.time()
+    try:
+        thumbnail = make_thumbnail(base64.b64decode(image_data), width, fmt)
+    except Exception as e:
+        conn.close()
+        app.logger.warning(f"Thumbnail failed for image {image_id}: {e}")
+        return None
+    c.execute("INSERT OR REPLACE INTO image_thumbnails (image_id, width, format, data) VALUES (?, ?, ?, ?)",
+              (image_id, width, fmt, thumbnail))
+    conn.commit()
+    conn.close()
+    record_metric("thumbnail.generated")
+    record_metric("thumbnail.generate_ms", round((time.time() - start) * 1000, 2))
+    return thumbnail
+
+def make_thumbnail(image_bytes, width, fmt):
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.draft("RGB", (width, width))  # Lets JPEG sources decode at reduced size
+        image = image.convert("RGB")
+        image.thumbnail((width, width * 4))
+        output = io.BytesIO()
+        if fmt == "webp":
+            image.save(output, "WEBP", quality=THUMBNAIL_QUALITY, method=4)
+        else:
+            image.save(output, "JPEG", quality=THUMBNAIL_QUALITY, progressive=True, optimize=True)
+        return output.getvalue()
+
+def benchmark_images(images=200, db_path="image_bench.db"):
+    # Compares what an image-heavy session costs to load with full-size images vs thumbnails.
+    # The decoded column is only an estimate (width * height * 4 bytes per image); the browser
+    # page at /bench/images measures the page's actual memory.
+    global storage
+    if Image is None:
+        print("Pillow is required for the image benchmark (pip install pillow).")
+        return
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    storage = ShardedStorage(db_path)
+    init_db(db_path)
+    sources = []
+    for i in range(8):
+        noise = Image.effect_noise((1024, 1024), 40 + i * 5)
+        gradient = Image.linear_gradient("L").resize((1024, 1024))
+        output = io.BytesIO()
+        Image.merge("RGB", (noise, gradient, gradient.rotate(90 * i))).save(output, "PNG")
+        sources.append(IMAGE_MESSAGE_PREFIX + "image/png;base64," + base64.b64encode(output.getvalue()).decode("ascii"))
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+                     (("bench", "assistant", sources[i % len(sources)]) for i in range(images)))
+    conn.commit()
+    conn.close()
+    client = app.test_client()
+    with client.session_transaction() as bench_session:
+        bench_session["session_id"] = "bench"
+
+    def load(width, accept):
+        # One page load: the first /history page plus every image on it
+        start = time.perf_counter()
+        page = client.get("/history").get_json()
+        total_bytes = 0
+        for message in page["messages"]:
+            url = message["image_url"] + (f"?w={width}" if width else "")
+            total_bytes += len(client.get(url, headers={"Accept": accept}).data)
+        return (time.perf_counter() - start) * 1000, total_bytes, len(page["messages"])
+
+    print(f"Session of {images} 1024x1024 images, first page of {min(images, HISTORY_PAGE_SIZE)}:")
+    cases = [("full size (before)", None, "image/*", 1024),
+             ("thumbnail 1x webp, first load", 256, "image/webp", 256),
+             ("thumbnail 1x webp, cached", 256, "image/webp", 256),
+             ("thumbnail 2x webp, first load", 512, "image/webp", 512),
+             ("thumbnail 1x jpeg, first load", 256, "image/jpeg", 256)]
+    for name, width, accept, side in cases:
+        elapsed, total_bytes, count = load(width, accept)
+        print(f"  {name:<32} {elapsed:8.0f} ms  {total_bytes / 1048576:7.1f} MB transferred  "
+              f"{count * side * side * 4 / 1048576:7.1f} MB decoded (estimate)")
+    print("Decoded sizes are width * height * 4, not measured; open /bench/images in a browser to measure page memory.")
+    os.remove(db_path)
+
+# Retention: sessions idle for RETENTION_ARCHIVE_DAYS, and the oldest messages of sessions over
+# RETENTION_SESSION_MB, move to the compressed archive so the live table stays small. Archived
+# sessions are deleted after RETENTION_DELETE_DAYS, oldest first when the database is over
+# RETENTION_TOTAL_MB. Freed pages are returned a few at a time with incremental_vacuum.
+# A limit of 0 disables that rule, and every rule is off by default: archived messages leave the
+# full-text search index, so archiving is something an operator opts into.
+RETENTION_ARCHIVE_DAYS = float(os.getenv("VENICE_RETENTION_ARCHIVE_DAYS", "0"))
+RETENTION_DELETE_DAYS = float(os.getenv("VENICE_RETENTION_DELETE_DAYS", "0"))
+RETENTION_SESSION_MB = float(os.getenv("VENICE_RETENTION_SESSION_MB", "0"))
+RETENTION_TOTAL_MB = float(os.getenv("VENICE_RETENTION_TOTAL_MB", "0"))
+RETENTION_INTERVAL = int(os.getenv("VENICE_RETENTION_INTERVAL", "3600"))  # Seconds between passes; 0 = never
+VACUUM_STEP_PAGES = 256  # Pages freed per incremental_vacuum step, so writers are only blocked briefly
+
+def archive_messages(conn, where, params):
+    c = conn.cursor()
+    c.execute("INSERT OR REPLACE INTO messages_archive (id, session_id, role, content, timestamp, message_id) "
+              f"SELECT id, session_id, role, deflate(content), timestamp, message_id FROM messages WHERE {where}", params)
+    c.execute(f"DELETE FROM messages WHERE {where}", params)
+    conn.commit()
+    return c.rowcount
+
+def apply_retention(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.create_function("deflate", 1, deflate_content)
+    c = conn.cursor()
+    archived = deleted = 0
+    if RETENTION_ARCHIVE_DAYS:
+        c.execute("SELECT session_id FROM messages GROUP BY session_id HAVING MAX(timestamp) < datetime('now', ?)",
+                  (f"-{RETENTION_ARCHIVE_DAYS} days",))
+        for (session_id,) in c.fetchall():
+            archived += archive_messages(conn, "session_id=?", (session_id,))
+            drop_history_index(session_id)
+    if RETENTION_SESSION_MB:
+        limit = int(RETENTION_SESSION_MB * 1024 * 1024)
+        c.execute("SELECT session_id, SUM(length(content)) FROM messages GROUP BY session_id HAVING SUM(length(content)) > ?",
+                  (limit,))
+        for session_id, size in c.fetchall():
+            # Keep the newest messages that fit in the limit
+            c.execute("SELECT id, length(content) FROM messages WHERE session_id=? ORDER BY id", (session_id,))
+            cutoff = None
+            for row_id, length in c.fetchall():
+                if size <= limit:
+                    break
+                size -= length
+                cutoff = row_id
+            if cutoff is not None:
+                archived += archive_messages(conn, "session_id=? AND id <= ?", (session_id, cutoff))
+                drop_history_index(session_id)
+    if RETENTION_DELETE_DAYS:
+        c.execute("DELETE FROM messages_archive WHERE session_id IN (SELECT session_id FROM messages_archive "
+                  "GROUP BY session_id HAVING MAX(timestamp) < datetime('now', ?))", (f"-{RETENTION_DELETE_DAYS} days",))
+        deleted += c.rowcount
+        conn.commit()
+    if RETENTION_TOTAL_MB:
+        limit = int(RETENTION_TOTAL_MB * 1024 * 1024)
+        c.execute("SELECT (SELECT TOTAL(length(content)) FROM messages) + (SELECT TOTAL(length(content)) FROM messages_archive)")
+        size = c.fetchone()[0]
+        c.execute("SELECT session_id, TOTAL(length(content)) FROM messages_archive GROUP BY session_id ORDER BY MAX(timestamp)")
+        for session_id, session_size in c.fetchall():
+            if size <= limit:
+                break
+            c.execute("DELETE FROM messages_archive WHERE session_id=?", (session_id,))
+            deleted += c.rowcount
+            size -= session_size
+        conn.commit()
+    conn.close()
+    record_metric("retention.archived_messages", archived)
+    record_metric("retention.deleted_messages", deleted)
+    return archived, deleted
+
+def incremental_vacuum(db_path):
+    conn = sqlite3.connect(db_path)
+    freed = 0
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while free_pages:
+            # executescript runs the pragma to completion; a plain execute frees a single page
+            conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES});")
+            remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if remaining >= free_pages:
+                break  # Another connection is reading; try again on the next pass
+            freed += free_pages - remaining
+            free_pages = remaining
+            time.sleep(0.01)  # Let queued writers in between steps
+    conn.close()
+    record_metric("retention.vacuumed_pages", freed)
+    return freed
+
+def retention_worker():
+    while True:
+        for db_path in storage.paths():
+            try:
+                archived, deleted = apply_retention(db_path)
+                freed = incremental_vacuum(db_path)
+                if archived or deleted or freed:
+                    app.logger.info(f"Retention archived {archived} and deleted {deleted} messages, "
+                                    f"freed {freed} pages in {db_path}")
+            except Exception:
+                app.logger.exception(f"Retention pass failed for {db_path}")
+        time.sleep(RETENTION_INTERVAL)
+
+def start_retention_worker():
+    if RETENTION_INTERVAL:
+        threading.Thread(target=retention_worker, daemon=True).start()
+
+def compact_database(db_path):
+    # One-off maintenance: apply retention now, then switch an older database to incremental
+    # auto-vacuum (this needs one full, blocking VACUUM) or just return its free pages.
+    size_before = os.path.getsize(db_path)
+    archived, deleted = apply_retention(db_path)
+    conn = sqlite3.connect(db_path)
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    conn.close()
+    incremental_vacuum(db_path)
+    print(f"Archived {archived} and deleted {deleted} messages; "
+          f"{size_before / 1048576:.1f} MB -> {os.path.getsize(db_path) / 1048576:.1f} MB")
+
+# Export / import: sessions move as NDJSON, one message per line, optionally gzip-compressed.
+# Export walks each table in primary key order with a plain cursor, so memory stays constant.
+# Bulk import (the CLI) drops the secondary indexes and full-text triggers, loads rows with
+# executemany in large transactions, then rebuilds them once.
+EXPORT_FETCH_ROWS = 1000
+IMPORT_BATCH_ROWS = 5000
+IMPORT_TRANSACTION_ROWS = 200000
+
+def iter_export_lines(session_id=None, db_paths=None):
+    # session_id=None exports every session, shard by shard; archived messages follow the live ones
+    if db_paths is None:
+        db_paths = storage.paths() if session_id is None else [storage.path_for(session_id)]
+    for db_path in db_paths:
+        yield from iter_shard_export_lines(session_id, db_path)
+
+def iter_shard_export_lines(session_id, db_path):
+    conn = open_db(db_path)
+    try:
+        for table, content in (("messages", "content"), ("messages_archive", "inflate(content)")):
+            c = conn.cursor()
+            if session_id is None:
+                c.execute(f"SELECT session_id, role, {content}, timestamp, message_id FROM {table} ORDER BY id")
+            else:
+                c.execute(f"SELECT session_id, role, {content}, timestamp, message_id FROM {table} "
+                          "WHERE session_id=? ORDER BY id", (str(session_id),))
+            while True:
+                rows = c.fetchmany(EXPORT_FETCH_ROWS)
+                if not rows:
+                    break
+                yield "".join(json.dumps({"session_id": row[0], "role": row[1], "content": row[2],
+                                          "timestamp": row[3], "message_id": row[4]}) + "\n" for row in rows)
+    finally:
+        conn.close()
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(1, zlib.DEFLATED, 31)  # Fastest level; wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def iter_import_records(stream):
+    # Accepts a binary stream of NDJSON, gzip-compressed or not
+    head = stream.peek(2)[:2] if hasattr(stream, "peek") else b""
+    if head == b"\x1f\x8b":
+        stream = gzip.GzipFile(fileobj=stream)
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def import_records(records, session_id=None, bulk=False, target=None):
+    # session_id puts every record into that session; otherwise records keep their own and are
+    # routed to their shard in target (the app's storage by default). Records whose message_id
+    # already exists are skipped. A normal import is one transaction per shard and leaves nothing
+    # behind if a record is bad. Bulk mode commits as it goes and drops the unique message_id index
+    # until the end, so it must only run while the app is stopped (the CLI import).
+    target = target or storage
+    completed = False
+    shards = {}
+    imported = loaded = 0
+    sessions = set()
+    if bulk:
+        sql = "INSERT INTO messages (session_id, role, content, timestamp, message_id) VALUES (?, ?, ?, ?, ?)"
+    else:
+        sql = ("INSERT INTO messages (session_id, role, content, timestamp, message_id) SELECT ?1, ?2, ?3, ?4, ?5 "
+               "WHERE NOT EXISTS (SELECT 1 FROM messages_archive WHERE message_id = ?5) "
+               "ON CONFLICT (message_id) DO NOTHING")
+
+    def open_shard(db_path):
+        init_db(db_path)
+        init_batch_db(db_path)
+        conn = sqlite3.connect(db_path)
+        if bulk:
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("DROP INDEX IF EXISTS idx_messages_session")
+            conn.execute("DROP INDEX IF EXISTS idx_messages_message_id")
+            for trigger in ("insert", "delete", "update_old", "update_new"):
+                conn.execute(f"DROP TRIGGER IF EXISTS messages_fts_{trigger}")
+            conn.execute("DROP TABLE IF EXISTS messages_fts")
+        return {"conn": conn, "batch": []}
+
+    def flush(shard):
+        nonlocal imported
+        cursor = shard["conn"].executemany(sql, shard["batch"])
+        imported += cursor.rowcount
+        shard["batch"] = []
+
+    try:
+        for record in records:
+            record_session = str(session_id or record["session_id"])
+            sessions.add(record_session)
+            db_path = target.path_for(record_session)
+            shard = shards.get(db_path)
+            if shard is None:
+                shard = shards[db_path] = open_shard(db_path)
+            shard["batch"].append((record_session, record.get("role", "user"), record.get("content", ""),
+                                   record.get("timestamp") or datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+                                   record.get("message_id") or str(uuid.uuid4())))
+            if len(shard["batch"]) == IMPORT_BATCH_ROWS:
+                flush(shard)
+            loaded += 1
+            if bulk and loaded % IMPORT_TRANSACTION_ROWS == 0:
+                for shard in shards.values():
+                    flush(shard)
+                    shard["conn"].commit()
+        for shard in shards.values():
+            flush(shard)
+        for shard in shards.values():
+            shard["conn"].commit()
+        completed = True
+    finally:
+        for db_path, shard in shards.items():
+            conn = shard["conn"]
+            if not completed:
+                conn.rollback()
+            if bulk:
+                # Keep the first copy of each message_id before the unique index comes back
+                cursor = conn.execute("DELETE FROM messages WHERE message_id IS NOT NULL AND id NOT IN "
+                                      "(SELECT MIN(id) FROM messages WHERE message_id IS NOT NULL GROUP BY message_id)")
+                imported -= cursor.rowcount
+                cursor = conn.execute("DELETE FROM messages WHERE message_id IN "
+                                      "(SELECT message_id FROM messages_archive WHERE message_id IS NOT NULL)")
+                imported -= cursor.rowcount
+                conn.commit()
+                conn.close()
+                init_db(db_path)  # Recreates the indexes and rebuilds the full-text index
+            else:
+                conn.close()
+    for imported_session in sessions:
+        drop_history_index(imported_session)
+    record_metric("import.messages", imported)
+    return imported
+
+@app.route("/export")
+def export_sessions():
+    # Exports the caller's own session only; other or all sessions are exported with the CLI
+    session_id = session.get("session_id")
+    if not session_id:
+        return jsonify({"error": "No active session"}), 400
+    lines = iter_export_lines(session_id)
+    if request.args.get("gzip"):
+        return Response(gzip_stream(lines), mimetype="application/gzip",
+                        headers={"Content-Disposition": "attachment; filename=conversations.ndjson.gz"})
+    return Response(lines, mimetype="application/x-ndjson",
+                    headers={"Content-Disposition": "attachment; filename=conversations.ndjson"})
+
+@app.route("/import", methods=["POST"])
+def import_sessions():
+    # Body is an export file. Messages always go into the caller's own session; keeping the
+    # file's session ids is left to the CLI.
+    session_id = session.get("session_id")
+    if not session_id:
+        return jsonify({"error": "No active session"}), 400
+    try:
+        imported = import_records(iter_import_records(io.BufferedReader(request.stream)), session_id)
+    except (ValueError, KeyError, OSError) as e:
+        return jsonify({"error": f"Invalid import file: {str(e)}"}), 400
+    return jsonify({"imported": imported})
+
+def export_to_file(path, session_id=None, source=None):
+    start = time.time()
+    source = source or storage
+    lines = iter_export_lines(session_id, [source.path_for(session_id)] if session_id else source.paths())
+    if path == "-":
+        for chunk in lines:
+            sys.stdout.write(chunk)
+        return
+    with open(path, "wb") as output:
+        for chunk in (gzip_stream(lines) if path.endswith(".gz") else (chunk.encode("utf-8") for chunk in lines)):
+            output.write(chunk)
+    print(f"Exported to {path} ({os.path.getsize(path) / 1048576:.1f} MB) in {time.time() - start:.1f}s",
+          file=sys.stderr)
+
+def import_from_file(path, target=None):
+    start = time.time()
+    with (open(path, "rb") if path != "-" else sys.stdin.buffer) as stream:
+        imported = import_records(iter_import_records(stream), bulk=True, target=target)
+    print(f"Imported {imported} messages in {time.time() - start:.1f}s", file=sys.stderr)
+
+def split_database(source_path, shards):
+    # Migration: copies every session of a single-file database into its shard files. The source
+    # file is left untouched; archived messages land in the live tables and are re-archived by the
+    # next retention pass. Thumbnails are rebuilt on demand and batch results are not copied.
+    start = time.time()
+    target = ShardedStorage(source_path, shards)
+    if source_path in target.paths():
+        print("The target needs more than one shard.", file=sys.stderr)
+        return
+    imported = import_records((json.loads(line) for chunk in iter_export_lines(db_paths=[source_path])
+                               for line in chunk.splitlines()), bulk=True, target=target)
+    print(f"Split {imported} messages from {source_path} into {shards} shards in {time.time() - start:.1f}s. "
+          f"Start the app with VENICE_DB_SHARDS={shards} to use them.", file=sys.stderr)
+
+def benchmark_shards(writers=16, messages=4000, db_path="shard_bench.db"):
+    # Concurrent save_message throughput: writers spread over 200 sessions, one commit per message
+    global storage
+    for shards in (1, 2, 4, 8):
+        storage = ShardedStorage(db_path, shards)
+        for path in storage.paths():
+            if os.path.exists(path):
+                os.remove(path)
+        storage.init()
+        failures = []
+
+        def writer(worker):
+            for i in range(worker, messages, writers):
+                try:
+                    save_message(f"bench-{i % 200}", "user", f"benchmark message {i} " * 20)
+                except sqlite3.OperationalError:
+                    failures.append(i)
+
+        threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(writers)]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+        print(f"  {shards} shard{'s' if shards > 1 else ' '}  {(messages - len(failures)) / elapsed:8.0f} writes/s  "
+              f"{len(failures)} locked")
+        for path in storage.paths():
+            os.remove(path)
+
+# Ranked full-text search with keyset pagination on (rank, id)
+def fts_query(text):
+    # Quote every term so user input can't hit FTS5 query syntax errors
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+def search_messages(query, session_id=None, role=None, since=None, until=None, limit=20, cursor=None, db_path=None):
+    # A session lives in one shard; searching all sessions merges the top results of every shard.
+    # Row ids are only unique within a shard, so results and the cursor carry (rank, shard, id).
+    if db_path is not None:
+        shards = [(0, db_path)]
+    else:
+        shards = [(shard, path) for shard, path in enumerate(storage.paths())
+                  if not session_id or path == storage.path_for(session_id)]
+    sql = (
+        "SELECT m.id, m.session_id, m.role, m.timestamp, bm25(messages_fts) AS rank, "
+        "snippet(messages_fts, 0, '<mark>', '</mark>', '…', 16) "
+        "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+        "WHERE messages_fts MATCH ?"
+    )
+    params = [fts_query(query)]
+    if session_id:
+        sql += " AND m.session_id = ?"
+        params.append(session_id)
+    if role:
+        sql += " AND m.role = ?"
+        params.append(role)
+    if since:
+        sql += " AND m.timestamp >= ?"
+        params.append(since)
+    if until:
+        sql += " AND m.timestamp < ?"
+        params.append(until)
+    rows = []
+    for shard, path in shards:
+        shard_sql, shard_params = sql, list(params)
+        if cursor:
+            last_rank, last_shard, last_id = cursor.split(":")
+            last_rank, last_shard = float(last_rank), int(last_shard)
+            if shard < last_shard:
+                shard_sql += " AND bm25(messages_fts) > ?"
+                shard_params.append(last_rank)
+            elif shard == last_shard:
+                shard_sql += " AND (bm25(messages_fts) > ? OR (bm25(messages_fts) = ? AND m.id > ?))"
+                shard_params += [last_rank, last_rank, int(last_id)]
+            else:
+                shard_sql += " AND bm25(messages_fts) >= ?"
+                shard_params.append(last_rank)
+        shard_sql += " ORDER BY rank, m.id LIMIT ?"
+        shard_params.append(limit)
+        conn = sqlite3.connect(path)
+        c = conn.cursor()
+        c.execute(shard_sql, shard_params)
+        rows += [row + (shard,) for row in c.fetchall()]
+        conn.close()
+    rows = sorted(rows, key=lambda row: (row[4], row[6], row[0]))[:limit]
+    results = [{"id": row[0], "shard": row[6], "session_id": row[1], "role": row[2], "timestamp": row[3],
+                "rank": row[4], "snippet": row[5]} for row in rows]
+    next_cursor = f"{rows[-1][4]!r}:{rows[-1][6]}:{rows[-1][0]}" if len(rows) == limit else None
+    return results, next_cursor
+
+@app.route("/search")
+def search():
+    if not fts_available:
+        return jsonify({"error": "Full-text search is not available in this SQLite build"}), 501
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Missing query parameter 'q'"}), 400
+    # Only ever searches the caller's own session; search_messages(session_id=None) is for local tools
+    session_id = session.get("session_id")
+    if not session_id:
+        return jsonify({"error": "No active session"}), 400
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    try:
+        results, next_cursor = search_messages(
+            query, session_id=session_id, role=request.args.get("role"),
+            since=request.args.get("since"), until=request.args.get("until"),
+            limit=limit, cursor=request.args.get("cursor"))
+    except (ValueError, sqlite3.OperationalError) as e:
+        return jsonify({"error": f"Invalid search: {str(e)}"}), 400
+    return jsonify({"results": results, "next_cursor": next_cursor})
+
+def benchmark_search(rows=2000000, queries=50, db_path="search_bench.db"):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    init_db(db_path)
+    rng = random.Random(0)
+    vocabulary = [f"word{i}" for i in range(20000)] + ["python", "weather", "linked", "list", "database", "image"]
+    conn = sqlite3.connect(db_path)
+    start = time.time()
+    batch = 50000
+    for offset in range(0, rows, batch):
+        conn.executemany(
+            "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+            ((f"session-{rng.randrange(5000)}", rng.choice(("user", "assistant")),
+              " ".join(rng.choice(vocabulary) for _ in range(rng.randint(5, 60))))
+             for _ in range(min(batch, rows - offset))))
+        conn.commit()
+    conn.close()
+    print(f"Loaded {rows} messages in {time.time() - start:.1f}s")
+    cases = {
+        "common term": {"query": "python"},
+        "two terms": {"query": "linked list"},
+        "rare term": {"query": "word12345"},
+        "session filter": {"query": "weather", "session_id": "session-42"},
+        "role + time filter": {"query": "database", "role": "user", "since": "2000-01-01"},
+    }
+    for name, kwargs in cases.items():
+        timings = []
+        for _ in range(queries):
+            t = time.perf_counter()
+            results, next_cursor = search_messages(limit=20, db_path=db_path, **kwargs)
+            if next_cursor:
+                search_messages(limit=20, cursor=next_cursor, db_path=db_path, **kwargs)
+            timings.append((time.perf_counter() - t) * 1000 / (2 if next_cursor else 1))
+        print(f"  {name:<20} p50 {percentile(timings, 50):8.2f} ms  p95 {percentile(timings, 95):8.2f} ms")
+    os.remove(db_path)
+
+@app.route("/new_chat", methods=["POST"])
+def new_chat():
+    data = request.json
+    keep_history = data.get("keep_history", False)
+    session_id = session.get("session_id")
+    if not keep_history and session_id:
+        conn = sqlite3.connect(storage.path_for(session_id))
+        c = conn.cursor()
+        c.execute("DELETE FROM messages WHERE session_id=?", (session_id,))
+        c.execute("DELETE FROM messages_archive WHERE session_id=?", (session_id,))
+        conn.commit()
+        conn.close()
+        drop_history_index(session_id)
+    return jsonify({"success": True})
+
+# Multiplexed per-tab channel: one WebSocket carries every POST the page makes, tagged with
+# a request id, plus server-pushed events such as streamed chat tokens. Each connection has at
+# most CHANNEL_MAX_INFLIGHT requests running; beyond that the server stops reading frames, so
+# TCP flow control pushes back on the browser. Each connection runs its frames on its own
+# threads, so a frame waiting for an admission slot never holds a thread another tab's chat needs;
+# the order in which waiting frames are served is left to admission control.
+CHANNEL_ENDPOINTS = {"/chat", "/save_message", "/execute", "/execute_subtask", "/generate_subtasks",
+                     "/check_completion", "/new_chat"}
+CHANNEL_MAX_INFLIGHT = 8
+
+def upstream_headers(api_key):
+    headers = {"Content-Type": "application/json"}
+    api_key = api_key or os.getenv("VENICE_API_KEY")
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    return headers
+
+def stream_upstream(endpoint, payload, headers, coalesce=None, trace=None):
+    # Yields content deltas from an OpenAI-style SSE stream. Like post_upstream, identical
+    # concurrent payloads share one call: the first caller streams it, the others get the whole
+    # reply as a single delta when it finishes. Traces store the reply in the non-streamed format,
+    # so replay serves it the same way to streamed and plain /chat turns.
+    start = time.time()
+    call, leader = None, True
+    if coalesce:
+        key = payload_hash({"endpoint": endpoint, "payload": payload, "stream": True,
+                            "auth": headers.get("Authorization", "")})
+        with inflight_lock:
+            call = inflight_calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                inflight_calls[key] = call
+        record_metric(f"coalesce.{coalesce}.{'leader' if leader else 'shared'}")
+    if not leader:
+        record_metric("upstream.calls_saved")
+        call["done"].wait()
+        if call["error"] is not None:
+            raise call["error"]
+        if trace is not None:
+            trace_upstream_call(trace, endpoint, payload, 200, call["result"], start, True)
+        yield json.loads(call["result"])["choices"][0]["message"]["content"]
+        return
+    parts = []
+    try:
+        for delta in stream_upstream_deltas(endpoint, payload, headers):
+            parts.append(delta)
+            yield delta
+        text = json.dumps({"choices": [{"message": {"role": "assistant", "content": "".join(parts)}}]})
+        if call is not None:
+            call["result"] = text
+        if trace is not None:
+            trace_upstream_call(trace, endpoint, payload, 200, text, start, False)
+    except UpstreamStreamError as e:
+        if trace is not None:
+            trace_upstream_call(trace, endpoint, payload, e.status_code, e.text, start, False)
+        if call is not None:
+            call["error"] = e
+        raise
+    except BaseException as e:
+        if call is not None:
+            call["error"] = e if isinstance(e, Exception) else RuntimeError("Upstream stream was abandoned")
+        raise
+    finally:
+        if call is not None:
+            with inflight_lock:
+                del inflight_calls[key]
+            call["done"].set()
+
+class UpstreamStreamError(RuntimeError):
+    def __init__(self, status_code, text):
+        super().__init__(f"Error {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+def stream_upstream_deltas(endpoint, payload, headers):
+    # Under replay the recorded reply arrives as a single delta
+    record_metric("upstream.calls")
+    if REPLAY_TRACE_PATH:
+        response = replay_upstream_response(endpoint, payload)
+        if response.status_code != 200:
+            raise UpstreamStreamError(response.status_code, response.text)
+        yield response.json()["choices"][0]["message"]["content"]
+        return
+    with requests.post(endpoint, json=dict(payload, stream=True), headers=headers, stream=True) as response:
+        if response.status_code != 200:
+            raise UpstreamStreamError(response.status_code, response.text)
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+def stream_text_turn(data, session_id, send_event, trace=None):
+    turn = prepare_text_turn(data, session_id)
+    if turn["reply"] is not None:
+        return {"reply": turn["reply"], "cached": turn["cached"]}
+    parts = []
+    succeeded = False
+    try:
+        for delta in stream_upstream(TEXT_ENDPOINT, turn["payload"], upstream_headers(data.get("api_key", "")),
+                                     coalesce="chat", trace=trace):
+            parts.append(delta)
+            send_event({"type": "token", "text": delta})
+        succeeded = True
+        reply = "".join(parts).strip()
+    except RuntimeError as e:
+        reply = str(e)
+    except Exception as e:
+        reply = f"Exception occurred: {str(e)}"
+    complete_text_turn(session_id, turn, reply, succeeded)
+    return {"reply": reply}
+
+def stream_channel_chat(body, session_id, send_event):
+    # Streamed chat frames bypass the views, so they are admitted and traced here
+    trace = {"start": time.time(), "upstream": []} if TRACE_PATH else None
+    status, result = run_channel_chat(body, session_id, send_event, trace)
+    if trace is not None:
+        write_request_trace(trace, "/chat", body, session_id, len(json.dumps(body)), status,
+                            len(json.dumps(result)))
+    return status, result
+
+def run_channel_chat(body, session_id, send_event, trace):
+    name = admission_class("/chat", body)
+    try:
+        started = admission.acquire(name)
+    except AdmissionRejected as e:
+        return 503, {"error": f"Server busy ({e.reason}), retry later", "retry_after": e.retry_after}
+    try:
+        if body.get("mode") == "image":
+            try:
+                variants = expand_image_variants(body)
+            except ValueError as e:
+                return 400, {"error": str(e)}
+            for event in image_variant_events(body, upstream_headers(body.get("api_key", "")), variants, trace):
+                if event["type"] == "response":
+                    return 200, event["body"]
+                send_event(event)
+        return 200, stream_text_turn(body, session_id, send_event, trace)
+    finally:
+        admission.release(name, started)
+
+def dispatch_channel_request(path, body, session_id):
+    # Runs the regular view, including its before/after_request hooks, for a channel frame
+    environ = EnvironBuilder(path=path, method="POST", json=body).get_environ()
+    with app.request_context(environ):
+        session["session_id"] = session_id
+        response = app.full_dispatch_request()
+        try:
+            return response.status_code, response.get_json()
+        finally:
+            response.close()  # Runs call_on_close callbacks, such as releasing the admission slot
+
+if Sock is not None:
+    sock = Sock(app)
+
+    @app.before_request
+    def check_channel_handshake():
+        # Browsers let any site open a WebSocket to this host, so the upgrade is refused unless it
+        # comes from this app's own page and carries the session cookie that page set
+        if request.path != "/ws":
+            return None
+        origin = request.headers.get("Origin", "")
+        if origin.rstrip("/") != request.host_url.rstrip("/"):
+            return jsonify({"error": "Cross-origin channel connections are not allowed"}), 403
+        if "session_id" not in session:
+            return jsonify({"error": "Open the app page before connecting"}), 403
+        return None
+
+    @sock.route("/ws")
+    def channel(ws):
+        session_id = session["session_id"]  # The session cookie is validated once per connection
+        send_lock = threading.Lock()
+        slots = threading.BoundedSemaphore(CHANNEL_MAX_INFLIGHT)
+        record_metric("channel.connections")
+
+        def send(frame):
+            with send_lock:
+                try:
+                    ws.send(json.dumps(frame))
+                except ConnectionClosed:
+                    pass
+
+        def handle(frame):
+            frame_id = frame.get("id")
+            start = time.time()
+            try:
+                path, body = frame.get("path"), frame.get("body") or {}
+                if path not in CHANNEL_ENDPOINTS:
+                    status, result = 404, {"error": f"Unknown channel path: {path}"}
+                elif path == "/chat" and (body.get("stream") and body.get("mode", "text") == "text"
+                                          or body.get("mode") == "image" and body.get("variants")):
+                    status, result = stream_channel_chat(body, session_id, lambda event: send(dict(event, id=frame_id)))
+                else:
+                    status, result = dispatch_channel_request(path, body, session_id)
+            except Exception as e:
+                app.logger.exception("Channel request failed")
+                status, result = 500, {"error": f"Exception: {str(e)}"}
+            finally:
+                slots.release()
+            record_metric("channel.requests")
+            record_metric("channel.latency_ms", round((time.time() - start) * 1000, 2))
+            send({"id": frame_id, "type": "response", "status": status, "body": result})
+
+        frame_pool = ThreadPoolExecutor(max_workers=CHANNEL_MAX_INFLIGHT)
+        try:
+            while True:
+                message = ws.receive()
+                slots.acquire()
+                try:
+                    frame = json.loads(message)
+                except ValueError:
+                    slots.release()
+                    send({"type": "error", "error": "Invalid frame"})
+                    continue
+                frame_pool.submit(handle, frame)
+        finally:
+            frame_pool.shutdown(wait=False)
+
+def benchmark_channel(requests_count=500, concurrency=8):
+    global storage
+    if Sock is None:
+        print("flask-sock is required for the channel benchmark (pip install flask-sock).")
+        return
+    storage = ShardedStorage("channel_bench.db")
+    storage.init()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    client = requests.Session()
+    client.get(base + "/")
+    cookie = "; ".join(f"{k}={v}" for k, v in client.cookies.items())
+
+    def body(i):
+        return {"role": "assistant", "content": f"Processing subtask {i}", "message_id": str(uuid.uuid4())}
+
+    def report(name, timings, elapsed):
+        print(f"  {name:<34} p50 {percentile(timings, 50):7.2f} ms  p95 {percentile(timings, 95):7.2f} ms  "
+              f"{len(timings) / elapsed:8.0f} req/s")
+
+    def run_fetch(name, post, workers):
+        timings = []
+        def one(i):
+            t = time.perf_counter()
+            post(base + "/save_message", json=body(i)).json()
+            timings.append((time.perf_counter() - t) * 1000)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(one, range(requests_count)))
+        report(name, timings, time.perf_counter() - start)
+
+    def run_channel(name, in_flight):
+        # The client's Host header omits the port, so the matching Origin does too
+        ws = WebSocketClient.connect(base.replace("http", "ws") + "/ws",
+                                     headers={"Cookie": cookie, "Origin": "http://127.0.0.1"})
+        sent = {}
+        timings = []
+        slots = threading.Semaphore(in_flight)
+        def receive():
+            for _ in range(requests_count):
+                frame = json.loads(ws.receive())
+                timings.append((time.perf_counter() - sent.pop(frame["id"])) * 1000)
+                slots.release()
+        receiver = threading.Thread(target=receive)
+        receiver.start()
+        start = time.perf_counter()
+        for i in range(requests_count):
+            slots.acquire()
+            sent[i] = time.perf_counter()
+            ws.send(json.dumps({"id": i, "path": "/save_message", "body": body(i)}))
+        receiver.join()
+        report(name, timings, time.perf_counter() - start)
+        ws.close()
+
+    print(f"{requests_count} /save_message calls (agent progress saves):")
+    run_fetch("fetch, new connection each", lambda url, json: requests.post(url, json=json, cookies=client.cookies), 1)
+    run_fetch("fetch, keep-alive", client.post, 1)
+    run_channel("channel", 1)
+    run_fetch(f"fetch, keep-alive x{concurrency}", client.post, concurrency)
+    run_channel(f"channel, {concurrency} in flight", concurrency)
+    server.shutdown()
+    os.remove(storage.base_path)
+
+INDEX_HTML = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Venice Chat App</title>
+    <meta name="render-worker" content="{{ worker_url }}">
+    <meta name="channel" content="{{ channel_enabled }}">
+    <link rel="stylesheet" href="{{ css_url }}">
+    <script src="{{ marked_url }}"></script>
+    <script src="{{ render_url }}"></script>
 </head>
 <body class="dark-mode">
     <div class="container">
         <h1>Venice Chat App</h1>
         <button onclick="startNewChat()">New Chat</button>
-        <div class="chat-container" id="chat-container"></div>
+        <div class="chat-container" id="chat-container"><div id="history-sentinel"></div></div>
         <!-- Mode Buttons -->
         <div class="mode-buttons">
             <button onclick="setMode('text')">Text</button>
@@ -748,6 +3112,17 @@ INDEX_HTML = '''
                 <input type="number" id="lora-strength" step="0.1" value="50">
                 <label>Seed (optional):</label>
                 <input type="text" id="seed" placeholder="Optional seed value">
+                <label>Variants:</label>
+                <select id="variant-axis">
+                    <option value="none" selected>Single image</option>
+                    <option value="seed_count">Random seeds (count)</option>
+                    <option value="seeds">Seeds</option>
+                    <option value="cfg_scale">CFG Scale</option>
+                    <option value="steps">Steps</option>
+                    <option value="styles">Art Styles</option>
+                </select>
+                <label>Variant Values:</label>
+                <input type="text" id="variant-values" placeholder="Comma-separated values, e.g. 4 or 5, 7.5, 10">
             </div>
             <!-- Agent Settings -->
             <div id="agent-settings" class="mode-settings">
@@ -773,379 +3148,1323 @@ INDEX_HTML = '''
             </div>
         </div>
     </div>
-    <script>
-        var currentMode = "text";
-        function setMode(mode) {
-            currentMode = mode;
-            updateModeSettings();
+    <script src="{{ js_url }}"></script>
+</body>
+</html>
+'''
+
+INDEX_CSS = '''
+html, body {
+    margin: 0; padding: 0;
+    height: 100%; width: 100%;
+    font-family: Arial, sans-serif;
+}
+body.dark-mode {
+    background-color: #2c2c2c;
+    color: #ccc;
+}
+body.light-mode {
+    background-color: #f7f7f7;
+    color: #000;
+}
+.container {
+    width: 100%; height: 100%;
+    display: flex; flex-direction: column;
+    align-items: center;
+    box-sizing: border-box;
+    padding: 10px;
+}
+h1 { text-align: center; }
+.chat-container {
+    width: 100%; max-width: 800px;
+    flex: 1;
+    border: 1px solid #444;
+    border-radius: 8px;
+    background: inherit;
+    padding: 20px;
+    overflow-y: auto;
+    display: flex;
+    flex-direction: column;
+    gap: 10px;
+}
+body.light-mode .message.user {
+    align-self: flex-end;
+    background-color: #dcf8c6;
+    color: #000;
+    border: 1px solid #aaa;
+}
+body.light-mode .message.assistant {
+    align-self: flex-start;
+    background-color: #fff;
+    color: #000;
+    border: 1px solid #aaa;
+}
+body.dark-mode .message.user {
+    align-self: flex-end;
+    background-color: #0056b3;
+    color: #fff;
+    border: 1px solid #007bff;
+}
+body.dark-mode .message.assistant {
+    align-self: flex-start;
+    background-color: #444;
+    color: #fff;
+    border: 1px solid #666;
+}
+.message {
+    max-width: 70%;
+    padding: 10px 15px;
+    border-radius: 15px;
+    line-height: 1.5;
+    word-wrap: break-word;
+}
+.input-container {
+    width: 100%; max-width: 800px;
+    display: flex; margin-top: 20px;
+}
+.input-container input {
+    flex: 1; padding: 10px;
+    border-radius: 4px; border: 1px solid #777;
+}
+.input-container button {
+    padding: 10px 20px; margin-left: 10px;
+    border: none; background: #007bff; color: #fff;
+    border-radius: 4px; cursor: pointer;
+}
+.mode-buttons {
+    margin-top: 10px;
+    display: flex;
+    justify-content: center;
+    gap: 20px;
+}
+.mode-buttons button {
+    padding: 10px 20px;
+    border: none;
+    background: #28a745;
+    color: #fff;
+    border-radius: 4px;
+    cursor: pointer;
+}
+.settings {
+    width: 100%; max-width: 800px;
+    margin-top: 20px;
+    border: 1px solid #444; border-radius: 8px;
+    background: inherit; padding: 10px;
+    display: none;
+    text-align: left;
+}
+.settings label { font-weight: bold; }
+.settings input, .settings select, .settings textarea {
+    width: 100%; padding: 5px; margin: 5px 0 10px 0;
+    border: 1px solid #777; border-radius: 4px;
+    background: inherit; color: inherit;
+}
+.toggle-settings {
+    margin-top: 10px;
+    cursor: pointer;
+    color: #007bff; text-decoration: underline;
+}
+.mode-settings { display: none; }
+.blinking-cursor {
+    font-weight: 100;
+    font-size: 1em;
+    color: #ccc;
+    -webkit-animation: 1s blink step-end infinite;
+    animation: 1s blink step-end infinite;
+}
+@keyframes blink {
+    from, to { border-right-color: transparent; }
+    50% { border-right-color: #ccc; }
+}
+@-webkit-keyframes blink {
+    from, to { border-right-color: transparent; }
+    50% { border-right-color: #ccc; }
+}
+.message.placeholder {
+    min-height: 40px;
+}
+.image-gallery {
+    display: grid;
+    grid-template-columns: repeat(auto-fill, minmax(200px, 1fr));
+    gap: 8px;
+    margin-top: 6px;
+}
+.image-gallery figure {
+    margin: 0;
+}
+img.thumbnail {
+    width: 256px;
+    max-width: 100%;
+    height: auto;
+    border: 1px solid #777;
+    border-radius: 4px;
+}
+.image-gallery img.thumbnail {
+    width: 100%;
+}
+.image-gallery figcaption {
+    font-size: 12px;
+    opacity: 0.8;
+}
+#history-sentinel {
+    min-height: 1px;
+    flex-shrink: 0;
+}
+pre {
+    background-color: #333;
+    color: #eee;
+    padding: 10px;
+    border-radius: 4px;
+    position: relative;
+    overflow-x: auto;
+}
+code {
+    font-family: Consolas, "Courier New", monospace;
+}
+.copy-button {
+    position: absolute;
+    top: 5px; right: 5px;
+    padding: 2px 6px;
+    font-size: 0.8em;
+    cursor: pointer;
+    background: #007bff;
+    border: none;
+    border-radius: 3px;
+    color: #fff;
+}
+#preview-container {
+    width: 100%; max-width: 800px;
+    margin-top: 10px;
+    border: 1px solid #444;
+    border-radius: 4px;
+    padding: 10px;
+    min-height: 50px;
+    background: inherit;
+    color: inherit;
+}
+'''
+
+# Incremental markdown rendering, shared by the chat page and the /bench/render page.
+# Finished blocks are parsed once and appended; only the trailing unfinished block is re-parsed.
+RENDER_JS = '''
+var renderWorker = null;
+var renderCallbacks = {};
+var renderRequestId = 0;
+try {
+    renderWorker = new Worker(document.querySelector("meta[name=render-worker]").content);
+    renderWorker.onmessage = function(event) {
+        var callback = renderCallbacks[event.data.id];
+        delete renderCallbacks[event.data.id];
+        if (callback) callback(event.data.html);
+    };
+} catch (error) {
+    renderWorker = null;  // Parse on the main thread instead
+}
+// The worker answers in request order, so callbacks run in the order they were queued
+function parseMarkdown(text, callback) {
+    if (!renderWorker) {
+        callback(marked.parse(text));
+        return;
+    }
+    var id = ++renderRequestId;
+    renderCallbacks[id] = callback;
+    renderWorker.postMessage({ id: id, text: text });
+}
+// Accepts text in chunks of any size (typed-out characters or streamed tokens)
+function IncrementalRenderer(element) {
+    this.element = element;
+    this.done = document.createElement("div");
+    this.tail = document.createElement("div");
+    element.innerHTML = "";
+    element.appendChild(this.done);
+    element.appendChild(this.tail);
+    this.text = "";
+    this.committed = 0;  // Characters already parsed as finished blocks
+    this.scanned = 0;    // Characters already scanned for block boundaries
+    this.inFence = false;
+    this.tailPending = false;
+    this.tailDirty = false;
+    this.finished = false;
+    this.onFinish = null;
+    this.onRender = null;
+}
+IncrementalRenderer.prototype.append = function(chunk) {
+    this.text += chunk;
+    var boundary = this.findBoundary();
+    if (boundary > this.committed) {
+        var block = this.text.slice(this.committed, boundary);
+        this.committed = boundary;
+        if (block.trim() !== "") {
+            var done = this.done;
+            parseMarkdown(block, function(html) { done.insertAdjacentHTML("beforeend", html); });
         }
-        function updateModeSettings() {
-            document.getElementById("text-settings").style.display = "none";
-            document.getElementById("image-settings").style.display = "none";
-            document.getElementById("agent-settings").style.display = "none";
-            if(currentMode === "text") {
-                document.getElementById("text-settings").style.display = "block";
-            } else if(currentMode === "image") {
-                document.getElementById("image-settings").style.display = "block";
-            } else if(currentMode === "agent") {
-                document.getElementById("agent-settings").style.display = "block";
-            }
+    }
+    this.renderTail();
+};
+// A blank line outside a fenced code block ends every block before it
+IncrementalRenderer.prototype.findBoundary = function() {
+    var boundary = this.committed;
+    var newline;
+    while ((newline = this.text.indexOf("\\n", this.scanned)) !== -1) {
+        var line = this.text.slice(this.scanned, newline);
+        this.scanned = newline + 1;
+        if (/^\\s*(```|~~~)/.test(line)) {
+            this.inFence = !this.inFence;
+        } else if (!this.inFence && line.trim() === "") {
+            boundary = this.scanned;
         }
-        updateModeSettings();
-        function toggleSettings() {
-            var settings = document.getElementById("settings");
-            settings.style.display = (settings.style.display === "none" || settings.style.display === "") ? "block" : "none";
+    }
+    return boundary;
+};
+IncrementalRenderer.prototype.renderTail = function() {
+    if (this.tailPending) {
+        this.tailDirty = true;
+        return;
+    }
+    this.tailPending = true;
+    var self = this;
+    var committedAtRequest = this.committed;
+    parseMarkdown(this.text.slice(this.committed), function(html) {
+        self.tailPending = false;
+        // Skip a stale tail whose text has since been committed as a finished block
+        if (committedAtRequest === self.committed) {
+            self.tail.innerHTML = html + (self.finished ? "" : "<span class='blinking-cursor'>|</span>");
+            if (self.onRender) self.onRender();
         }
-        function toggleTheme(themeClass) {
-            document.body.className = themeClass;
+        if (self.tailDirty) {
+            self.tailDirty = false;
+            self.renderTail();
+        } else if (self.finished && self.onFinish) {
+            var onFinish = self.onFinish;
+            self.onFinish = null;
+            onFinish();
         }
-        function appendAndSaveMessage(role, text) {
-            var chatContainer = document.getElementById("chat-container");
-            var messageDiv = document.createElement("div");
-            messageDiv.className = "message " + role;
-            messageDiv.innerHTML = "<strong>" + role + ":</strong> " + marked.parse(text);
-            chatContainer.appendChild(messageDiv);
-            chatContainer.scrollTop = chatContainer.scrollHeight;
-            fetch("/save_message", {
-                method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ role: role, content: text })
-            }).catch(error => console.error("Error saving message:", error));
-            return messageDiv;
+    });
+};
+IncrementalRenderer.prototype.finish = function(callback) {
+    this.finished = true;
+    this.onFinish = callback || null;
+    this.renderTail();
+};
+'''
+
+RENDER_WORKER_JS = '''
+importScripts("{{ marked_url }}");
+self.onmessage = function(event) {
+    self.postMessage({ id: event.data.id, html: marked.parse(event.data.text) });
+};
+'''
+
+INDEX_JS = '''
+// One multiplexed WebSocket per tab carries every POST; postJSON falls back to fetch while
+// the channel is unavailable. Frames wait in an outbox while the socket's buffer is full.
+var CHANNEL_MAX_BUFFERED = 1024 * 1024;
+var channel = null;
+var channelPending = {};
+var channelRequestId = 0;
+var channelOutbox = [];
+var channelRetryDelay = 1000;
+function openChannel() {
+    if (!window.WebSocket || document.querySelector("meta[name=channel]").content !== "1") return;
+    var ws = new WebSocket((location.protocol === "https:" ? "wss://" : "ws://") + location.host + "/ws");
+    ws.onopen = function() {
+        channel = ws;
+        channelRetryDelay = 1000;
+    };
+    ws.onmessage = function(event) {
+        var frame = JSON.parse(event.data);
+        var pending = channelPending[frame.id];
+        if (!pending) return;
+        if (frame.type === "response") {
+            delete channelPending[frame.id];
+            pending.resolve(frame.body);
+        } else if (pending.onEvent) {
+            pending.onEvent(frame);
         }
-        function typeOutText(element, fullText, callback) {
-            let i = 0;
-            let accumulatedText = "";
-            let interval = setInterval(function(){
-                if (i < fullText.length) {
-                    accumulatedText += fullText.charAt(i);
-                    element.innerHTML = marked.parse(accumulatedText) + "<span class='blinking-cursor'>|</span>";
-                    i++;
-                } else {
-                    clearInterval(interval);
-                    element.innerHTML = marked.parse(fullText);
-                    if(callback) callback();
-                    addCopyButtonsToCodeBlocks(element);
-                }
-            }, 10);
+    };
+    ws.onclose = function() {
+        channel = null;
+        channelOutbox = [];
+        Object.keys(channelPending).forEach(function(id) {
+            channelPending[id].reject(new Error("Connection closed"));
+            delete channelPending[id];
+        });
+        setTimeout(openChannel, channelRetryDelay);
+        channelRetryDelay = Math.min(channelRetryDelay * 2, 30000);
+    };
+}
+function flushChannel() {
+    while (channel && channelOutbox.length && channel.bufferedAmount < CHANNEL_MAX_BUFFERED) {
+        channel.send(channelOutbox.shift());
+    }
+    if (channel && channelOutbox.length) setTimeout(flushChannel, 20);
+}
+// A 503 from admission control carries retry_after; the request was not started, so it is retried
+var MAX_BUSY_RETRIES = 2;
+function postJSON(path, body, onEvent, attempt) {
+    attempt = attempt || 0;
+    return sendJSON(path, body, onEvent).then(function(data) {
+        if (!data || !data.retry_after || attempt >= MAX_BUSY_RETRIES) return data;
+        return new Promise(function(resolve) { setTimeout(resolve, data.retry_after * 1000); })
+            .then(function() { return postJSON(path, body, onEvent, attempt + 1); });
+    });
+}
+function sendJSON(path, body, onEvent) {
+    if (channel) {
+        return new Promise(function(resolve, reject) {
+            var id = ++channelRequestId;
+            channelPending[id] = { resolve: resolve, reject: reject, onEvent: onEvent };
+            channelOutbox.push(JSON.stringify({ id: id, path: path, body: body }));
+            flushChannel();
+        });
+    }
+    return fetch(path, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(body)
+    }).then(function(response) {
+        if ((response.headers.get("Content-Type") || "").indexOf("application/x-ndjson") === 0) {
+            return readEventStream(response, onEvent);
         }
-        function addCopyButtonsToCodeBlocks(container) {
-            var codeBlocks = container.querySelectorAll("pre");
-            codeBlocks.forEach(function(preBlock) {
-                if(!preBlock.querySelector(".copy-button")) {
-                    var button = document.createElement("button");
-                    button.textContent = "Copy";
-                    button.className = "copy-button";
-                    button.onclick = function() {
-                        navigator.clipboard.writeText(preBlock.textContent).then(function(){
-                            button.textContent = "Copied!";
-                            setTimeout(function(){ button.textContent = "Copy"; }, 2000);
-                        });
-                    };
-                    preBlock.insertBefore(button, preBlock.firstChild);
-                }
+        return response.json();
+    });
+}
+// Streamed responses carry the same events as channel frames, ending with {"type": "response", "body": ...}
+async function readEventStream(response, onEvent) {
+    var reader = response.body.getReader();
+    var decoder = new TextDecoder();
+    var buffered = "";
+    var result = null;
+    while (true) {
+        var chunk = await reader.read();
+        if (chunk.done) break;
+        buffered += decoder.decode(chunk.value, { stream: true });
+        var lines = buffered.split("\\n");
+        buffered = lines.pop();
+        lines.forEach(function(line) {
+            if (!line) return;
+            var event = JSON.parse(line);
+            if (event.type === "response") {
+                result = event.body;
+            } else if (onEvent) {
+                onEvent(event);
+            }
+        });
+    }
+    return result;
+}
+openChannel();
+var currentMode = "text";
+function setMode(mode) {
+    currentMode = mode;
+    updateModeSettings();
+}
+function updateModeSettings() {
+    document.getElementById("text-settings").style.display = "none";
+    document.getElementById("image-settings").style.display = "none";
+    document.getElementById("agent-settings").style.display = "none";
+    if(currentMode === "text") {
+        document.getElementById("text-settings").style.display = "block";
+    } else if(currentMode === "image") {
+        document.getElementById("image-settings").style.display = "block";
+    } else if(currentMode === "agent") {
+        document.getElementById("agent-settings").style.display = "block";
+    }
+}
+updateModeSettings();
+function toggleSettings() {
+    var settings = document.getElementById("settings");
+    settings.style.display = (settings.style.display === "none" || settings.style.display === "") ? "block" : "none";
+}
+function toggleTheme(themeClass) {
+    document.body.className = themeClass;
+}
+function newMessageId() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + "-" + Math.random().toString(36).slice(2);
+}
+function appendMessage(role, text) {
+    var chatContainer = document.getElementById("chat-container");
+    var messageDiv = document.createElement("div");
+    messageDiv.className = "message " + role;
+    messageDiv.innerHTML = "<strong>" + role + ":</strong> " + marked.parse(text);
+    chatContainer.appendChild(messageDiv);
+    chatContainer.scrollTop = chatContainer.scrollHeight;
+    return messageDiv;
+}
+function saveMessage(role, text, messageId) {
+    return postJSON("/save_message", { role: role, content: text, message_id: messageId || newMessageId() })
+        .catch(error => console.error("Error saving message:", error));
+}
+// Images are shown as lazily loaded server thumbnails (with srcset for denser screens) that link
+// to the full image, so the tab never keeps full-size bitmaps of the whole session decoded.
+function thumbnailMarkup(imageUrl) {
+    return "<a href='" + imageUrl + "' target='_blank' rel='noopener'><img class='thumbnail' loading='lazy' decoding='async'" +
+        " src='" + imageUrl + "?w=256' srcset='" + imageUrl + "?w=256 256w, " + imageUrl + "?w=512 512w'" +
+        " sizes='256px' width='256' alt='Generated image'/></a>";
+}
+// Stores a generated image and swaps its inline data URL for a thumbnail once the server has it
+function saveImageMessage(element, dataUrl) {
+    var messageId = newMessageId();
+    return saveMessage("assistant", "Image generated: " + dataUrl, messageId).then(function() {
+        element.innerHTML = thumbnailMarkup("/message_image/m/" + encodeURIComponent(messageId));
+    });
+}
+function appendAndSaveMessage(role, text) {
+    var messageDiv = appendMessage(role, text);
+    saveMessage(role, text);
+    return messageDiv;
+}
+function typeOutText(element, fullText, callback) {
+    let i = 0;
+    let renderer = new IncrementalRenderer(element);
+    let interval = setInterval(function(){
+        if (i < fullText.length) {
+            renderer.append(fullText.charAt(i));
+            i++;
+        } else {
+            clearInterval(interval);
+            renderer.finish(function() {
+                addCopyButtonsToCodeBlocks(element);
+                if(callback) callback();
             });
         }
-        async function executeAgentTask(task) {
-            appendAndSaveMessage("assistant", "Starting agent task: " + task);
-            var apiKey = document.getElementById("api-key").value;
-            var model = document.getElementById("agent-model-select").value;
-            var temperature = parseFloat(document.getElementById("agent-temperature").value);
-            var top_p = parseFloat(document.getElementById("agent-top-p").value);
-            var max_tokens = parseInt(document.getElementById("agent-max-tokens").value);
-            var presence_penalty = parseFloat(document.getElementById("agent-presence-penalty").value);
-            var frequency_penalty = parseFloat(document.getElementById("agent-frequency-penalty").value);
-            var autoExecute = document.getElementById("auto-execute-agent").checked;
-            var additionalWhitelist = document.getElementById("additional-whitelist").value.split(',').map(cmd => cmd.trim());
-            var commandWhitelist = ['ls', 'pwd', 'whoami', 'echo'].concat(additionalWhitelist);
-
-            var subtasksResponse = await fetch("/generate_subtasks", {
-                method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({
-                    task: task,
-                    model: model,
-                    temperature: temperature,
-                    top_p: top_p,
-                    max_tokens: max_tokens,
-                    presence_penalty: presence_penalty,
-                    frequency_penalty: frequency_penalty,
-                    api_key: apiKey
-                })
-            });
-            var subtasksData = await subtasksResponse.json();
-            if (subtasksData.error) {
-                appendAndSaveMessage("assistant", "Error generating subtasks: " + subtasksData.error);
-                return;
+    }, 10);
+}
+function addCopyButtonsToCodeBlocks(container) {
+    var codeBlocks = container.querySelectorAll("pre");
+    codeBlocks.forEach(function(preBlock) {
+        if(!preBlock.querySelector(".copy-button")) {
+            var button = document.createElement("button");
+            button.textContent = "Copy";
+            button.className = "copy-button";
+            button.onclick = function() {
+                navigator.clipboard.writeText(preBlock.textContent).then(function(){
+                    button.textContent = "Copied!";
+                    setTimeout(function(){ button.textContent = "Copy"; }, 2000);
+                });
+            };
+            preBlock.insertBefore(button, preBlock.firstChild);
+        }
+    });
+}
+// Starts a command, shows its output live while it runs and resolves with the capped result
+var COMMAND_VIEW_CHARS = 20000;
+async function runCommand(command, approved) {
+    var started = await postJSON("/execute", { command: command, approved: approved, async: true });
+    if (!started.command_id) {
+        appendMessage("assistant", "Command output: " + started.output);
+        return started.output;
+    }
+    var messageDiv = appendMessage("assistant", "Command output:");
+    var view = document.createElement("pre");
+    messageDiv.appendChild(view);
+    var response = await fetch("/execute/" + started.command_id + "/stream");
+    var reader = response.body.getReader();
+    var decoder = new TextDecoder();
+    var buffered = "";
+    var result = null;
+    while (result === null) {
+        var chunk = await reader.read();
+        if (chunk.done) break;
+        buffered += decoder.decode(chunk.value, { stream: true });
+        var lines = buffered.split("\\n");
+        buffered = lines.pop();
+        lines.forEach(function(line) {
+            if (!line) return;
+            var event = JSON.parse(line);
+            if (event.done) {
+                result = event.output;
+            } else if (event.text) {
+                view.textContent = (view.textContent + event.text).slice(-COMMAND_VIEW_CHARS);
             }
-            var subtasks = subtasksData.subtasks;
-
-            while (true) {
-                var results = [];
-                for (var subtask of subtasks) {
-                    appendAndSaveMessage("assistant", "Processing subtask: " + subtask.content);
-                    if (subtask.type === "text") {
-                        var textPayload = {
-                            mode: "text",
-                            message: subtask.content,
-                            api_key: apiKey,
-                            model: model,
-                            temperature: temperature,
-                            top_p: top_p,
-                            max_tokens: max_tokens,
-                            presence_penalty: presence_penalty,
-                            frequency_penalty: frequency_penalty
-                        };
-                        var textResponse = await fetch("/chat", {
-                            method: "POST",
-                            headers: { "Content-Type": "application/json" },
-                            body: JSON.stringify(textPayload)
-                        });
-                        var textData = await textResponse.json();
-                        appendAndSaveMessage("assistant", "Text subtask result: " + textData.reply);
-                        results.push({ subtask: subtask.content, result: textData.reply });
-                    } else if (subtask.type === "command") {
-                        var command = subtask.content;
-                        var cmdBase = command.split(' ')[0];
-                        var isWhitelisted = commandWhitelist.includes(cmdBase);
-                        var execute = false;
-                        var approved = false;
-                        if (autoExecute && isWhitelisted) {
-                            execute = true;
-                            appendAndSaveMessage("assistant", "Auto-executing whitelisted command: " + command);
-                        } else {
-                            if (!isWhitelisted) {
-                                appendAndSaveMessage("assistant", "Command not in whitelist: " + command);
-                            } else {
-                                appendAndSaveMessage("assistant", "Awaiting approval for command: " + command);
-                            }
-                            execute = confirm(`Do you want to execute the command: ${command}?`);
-                            approved = execute && !isWhitelisted;
-                        }
-                        if (execute) {
-                            appendAndSaveMessage("assistant", "Executing command: " + command);
-                            var execPayload = { command: command, approved: approved };
-                            var execResponse = await fetch("/execute", {
-                                method: "POST",
-                                headers: { "Content-Type": "application/json" },
-                                body: JSON.stringify(execPayload)
-                            });
-                            var execData = await execResponse.json();
-                            appendAndSaveMessage("assistant", "Command output: " + execData.output);
-                            results.push({ subtask: subtask.content, result: execData.output });
-                        } else {
-                            appendAndSaveMessage("assistant", "Command skipped: " + command);
-                            results.push({ subtask: subtask.content, result: "Command skipped." });
-                        }
-                    }
-                }
+        });
+        var chatContainer = document.getElementById("chat-container");
+        chatContainer.scrollTop = chatContainer.scrollHeight;
+    }
+    if (result === null) {
+        result = (await fetch("/execute/" + started.command_id).then(r => r.json())).output || "No output.";
+    }
+    view.textContent = result;
+    return result;
+}
+async function executeAgentTask(task) {
+    appendAndSaveMessage("assistant", "Starting agent task: " + task);
+    var apiKey = document.getElementById("api-key").value;
+    var model = document.getElementById("agent-model-select").value;
+    var temperature = parseFloat(document.getElementById("agent-temperature").value);
+    var top_p = parseFloat(document.getElementById("agent-top-p").value);
+    var max_tokens = parseInt(document.getElementById("agent-max-tokens").value);
+    var presence_penalty = parseFloat(document.getElementById("agent-presence-penalty").value);
+    var frequency_penalty = parseFloat(document.getElementById("agent-frequency-penalty").value);
+    var autoExecute = document.getElementById("auto-execute-agent").checked;
+    var additionalWhitelist = document.getElementById("additional-whitelist").value.split(',').map(cmd => cmd.trim());
+    var commandWhitelist = ['ls', 'pwd', 'whoami', 'echo'].concat(additionalWhitelist);
+
+    var subtasksData = await postJSON("/generate_subtasks", {
+        task: task,
+        model: model,
+        temperature: temperature,
+        top_p: top_p,
+        max_tokens: max_tokens,
+        presence_penalty: presence_penalty,
+        frequency_penalty: frequency_penalty,
+        api_key: apiKey
+    });
+    if (subtasksData.error) {
+        appendAndSaveMessage("assistant", "Error generating subtasks: " + subtasksData.error);
+        return;
+    }
+    var subtasks = subtasksData.subtasks;
+    var jobResults = [];
 
-                appendAndSaveMessage("assistant", "Checking task completion...");
-                var checkPayload = {
+    while (true) {
+        var results = [];
+        for (var subtask of subtasks) {
+            appendAndSaveMessage("assistant", "Processing subtask: " + subtask.content);
+            if (subtask.type === "text") {
+                // Runs outside the chat session: only this job's own results are sent as context
+                var textPayload = {
                     task: task,
-                    results: results,
+                    subtask: subtask.content,
+                    results: jobResults.concat(results),
+                    api_key: apiKey,
                     model: model,
                     temperature: temperature,
                     top_p: top_p,
                     max_tokens: max_tokens,
                     presence_penalty: presence_penalty,
-                    frequency_penalty: frequency_penalty,
-                    api_key: apiKey
+                    frequency_penalty: frequency_penalty
                 };
-                var checkResponse = await fetch("/check_completion", {
-                    method: "POST",
-                    headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify(checkPayload)
-                });
-                var checkData = await checkResponse.json();
-
-                if (checkData.complete) {
-                    appendAndSaveMessage("assistant", "Task complete.");
-                    break;
-                } else if (checkData.subtasks) {
-                    subtasks = checkData.subtasks;
-                } else if (checkData.question) {
-                    var answer = prompt(checkData.question);
-                    appendAndSaveMessage("user", "Clarification provided: " + answer);
-                    checkPayload.answer = answer;
-                    var answerResponse = await fetch("/check_completion", {
-                        method: "POST",
-                        headers: { "Content-Type": "application/json" },
-                        body: JSON.stringify(checkPayload)
-                    });
-                    var answerData = await answerResponse.json();
-                    if (answerData.complete) {
-                        appendAndSaveMessage("assistant", "Task complete after clarification.");
-                        break;
-                    } else if (answerData.subtasks) {
-                        subtasks = answerData.subtasks;
+                var textData = await postJSON("/execute_subtask", textPayload);
+                appendAndSaveMessage("assistant", "Text subtask result: " + textData.reply);
+                results.push({ subtask: subtask.content, result: textData.reply });
+            } else if (subtask.type === "command") {
+                var command = subtask.content;
+                var cmdBase = command.split(' ')[0];
+                var isWhitelisted = commandWhitelist.includes(cmdBase);
+                var execute = false;
+                var approved = false;
+                if (autoExecute && isWhitelisted) {
+                    execute = true;
+                    appendAndSaveMessage("assistant", "Auto-executing whitelisted command: " + command);
+                } else {
+                    if (!isWhitelisted) {
+                        appendAndSaveMessage("assistant", "Command not in whitelist: " + command);
                     } else {
-                        appendAndSaveMessage("assistant", "Error: No valid response after clarification.");
-                        break;
+                        appendAndSaveMessage("assistant", "Awaiting approval for command: " + command);
                     }
+                    execute = confirm(`Do you want to execute the command: ${command}?`);
+                    approved = execute && !isWhitelisted;
+                }
+                if (execute) {
+                    appendAndSaveMessage("assistant", "Executing command: " + command);
+                    var output = await runCommand(command, approved);
+                    saveMessage("assistant", "Command output: " + output);
+                    results.push({ subtask: subtask.content, result: output });
                 } else {
-                    appendAndSaveMessage("assistant", "Error: Invalid response from check_completion.");
-                    break;
+                    appendAndSaveMessage("assistant", "Command skipped: " + command);
+                    results.push({ subtask: subtask.content, result: "Command skipped." });
                 }
             }
         }
-        function sendMessage() {
-            var input = document.getElementById("user-input");
-            var message = input.value;
-            if(!message) return;
-            appendAndSaveMessage("user", message);
-            input.value = "";
-            var apiKey = document.getElementById("api-key").value;
-            if(currentMode === "text") {
-                var payload = {
-                    mode: "text",
-                    message: message,
-                    api_key: apiKey,
-                    system_prompt: document.getElementById("system-prompt").value,
-                    model: document.getElementById("text-model-select").value,
-                    temperature: parseFloat(document.getElementById("temperature").value),
-                    top_p: parseFloat(document.getElementById("top-p").value),
-                    max_tokens: parseInt(document.getElementById("max-tokens").value),
-                    presence_penalty: parseFloat(document.getElementById("presence-penalty").value),
-                    frequency_penalty: parseFloat(document.getElementById("frequency-penalty").value)
-                };
-                var veniceParams = document.getElementById("venice-params").value;
-                if (veniceParams.trim() !== "") {
-                    payload.venice_params = veniceParams;
-                }
-                var assistantMsgDiv = document.createElement("div");
-                assistantMsgDiv.className = "message assistant";
-                assistantMsgDiv.innerHTML = "<strong>assistant:</strong> <span class='typing'>Assistant is thinking...</span>";
-                document.getElementById("chat-container").appendChild(assistantMsgDiv);
-                document.getElementById("chat-container").scrollTop = document.getElementById("chat-container").scrollHeight;
-                var typingSpan = assistantMsgDiv.querySelector(".typing");
-                fetch("/chat", {
-                    method: "POST",
-                    headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify(payload)
-                })
-                .then(response => response.json())
-                .then(data => {
-                    typeOutText(typingSpan, data.reply, function() {
-                        fetch("/save_message", {
-                            method: "POST",
-                            headers: { "Content-Type": "application/json" },
-                            body: JSON.stringify({ role: "assistant", content: data.reply })
-                        }).catch(error => console.error("Error saving message:", error));
+        jobResults = jobResults.concat(results);
+
+        appendAndSaveMessage("assistant", "Checking task completion...");
+        var checkPayload = {
+            task: task,
+            results: results,
+            model: model,
+            temperature: temperature,
+            top_p: top_p,
+            max_tokens: max_tokens,
+            presence_penalty: presence_penalty,
+            frequency_penalty: frequency_penalty,
+            api_key: apiKey
+        };
+        var checkData = await postJSON("/check_completion", checkPayload);
+
+        if (checkData.complete) {
+            appendAndSaveMessage("assistant", "Task complete.");
+            break;
+        } else if (checkData.subtasks) {
+            subtasks = checkData.subtasks;
+        } else if (checkData.question) {
+            var answer = prompt(checkData.question);
+            appendAndSaveMessage("user", "Clarification provided: " + answer);
+            checkPayload.answer = answer;
+            var answerData = await postJSON("/check_completion", checkPayload);
+            if (answerData.complete) {
+                appendAndSaveMessage("assistant", "Task complete after clarification.");
+                break;
+            } else if (answerData.subtasks) {
+                subtasks = answerData.subtasks;
+            } else {
+                appendAndSaveMessage("assistant", "Error: No valid response after clarification.");
+                break;
+            }
+        } else {
+            appendAndSaveMessage("assistant", "Error: Invalid response from check_completion.");
+            break;
+        }
+    }
+}
+function sendMessage() {
+    var input = document.getElementById("user-input");
+    var message = input.value;
+    if(!message) return;
+    input.value = "";
+    var apiKey = document.getElementById("api-key").value;
+    if(currentMode === "text") {
+        // /chat persists both sides of a text turn under these ids
+        appendMessage("user", message);
+        var payload = {
+            mode: "text",
+            message: message,
+            message_id: newMessageId(),
+            reply_id: newMessageId(),
+            api_key: apiKey,
+            system_prompt: document.getElementById("system-prompt").value,
+            model: document.getElementById("text-model-select").value,
+            temperature: parseFloat(document.getElementById("temperature").value),
+            top_p: parseFloat(document.getElementById("top-p").value),
+            max_tokens: parseInt(document.getElementById("max-tokens").value),
+            presence_penalty: parseFloat(document.getElementById("presence-penalty").value),
+            frequency_penalty: parseFloat(document.getElementById("frequency-penalty").value)
+        };
+        var veniceParams = document.getElementById("venice-params").value;
+        if (veniceParams.trim() !== "") {
+            payload.venice_params = veniceParams;
+        }
+        var assistantMsgDiv = document.createElement("div");
+        assistantMsgDiv.className = "message assistant";
+        assistantMsgDiv.innerHTML = "<strong>assistant:</strong> <span class='typing'>Assistant is thinking...</span>";
+        document.getElementById("chat-container").appendChild(assistantMsgDiv);
+        document.getElementById("chat-container").scrollTop = document.getElementById("chat-container").scrollHeight;
+        var typingSpan = assistantMsgDiv.querySelector(".typing");
+        // Over the channel the reply streams in as tokens; otherwise it is typed out at the end
+        payload.stream = true;
+        var streamRenderer = null;
+        postJSON("/chat", payload, function(event) {
+            if (event.type === "token") {
+                if (!streamRenderer) streamRenderer = new IncrementalRenderer(typingSpan);
+                streamRenderer.append(event.text);
+            }
+        })
+        .then(data => {
+            if (streamRenderer) {
+                streamRenderer.finish(function() { addCopyButtonsToCodeBlocks(typingSpan); });
+            } else {
+                typeOutText(typingSpan, data.reply);
+            }
+        })
+        .catch(error => {
+            console.error("Error:", error);
+            typingSpan.innerHTML = "Error: " + error;
+        });
+    } else if(currentMode === "image") {
+        appendAndSaveMessage("user", message);
+        var payload = {
+            mode: "image",
+            message: message,
+            api_key: apiKey,
+            model: document.getElementById("image-model-select").value,
+            image_height: parseInt(document.getElementById("image-height").value),
+            image_width: parseInt(document.getElementById("image-width").value),
+            steps: parseInt(document.getElementById("image-steps").value),
+            hide_watermark: document.getElementById("hide-watermark").value === "true",
+            embed_exif_metadata: document.getElementById("embed-exif").value === "true",
+            negative_prompt: document.getElementById("negative-prompt").value,
+            cfg_scale: parseFloat(document.getElementById("cfg-scale").value),
+            lora_strength: parseFloat(document.getElementById("lora-strength").value),
+            format: document.getElementById("image-format").value
+        };
+        var artStyle = document.getElementById("art-style").value;
+        payload.prompt = artStyle.trim() !== "" ? message + " in " + artStyle + " style" : message;
+        var seedValue = document.getElementById("seed").value;
+        if(seedValue.trim() !== "") { 
+            payload.seed = seedValue;
+        }
+        var variants = imageVariants();
+        if (variants) {
+            payload.variants = variants;
+            generateImageVariants(payload);
+            return;
+        }
+        var assistantMsgDiv = document.createElement("div");
+        assistantMsgDiv.className = "message assistant";
+        assistantMsgDiv.innerHTML = "<strong>assistant:</strong> <span class='typing'>Generating image...</span>";
+        document.getElementById("chat-container").appendChild(assistantMsgDiv);
+        document.getElementById("chat-container").scrollTop = document.getElementById("chat-container").scrollHeight;
+        var typingSpan = assistantMsgDiv.querySelector(".typing");
+        postJSON("/chat", payload)
+        .then(data => {
+            if (data.image_url) {
+                if (data.image_url.startsWith("Error:")) {
+                    typingSpan.innerHTML = data.image_url;
+                    saveMessage("assistant", data.image_url);
+                } else {
+                    var imageUrls = data.image_urls || [data.image_url];
+                    assistantMsgDiv.innerHTML = "<strong>assistant:</strong><br>";
+                    imageUrls.forEach(function(url) {
+                        var holder = document.createElement("span");
+                        holder.innerHTML = "<img class='thumbnail' src='" + url + "'/>";
+                        assistantMsgDiv.appendChild(holder);
+                        saveImageMessage(holder, url);
                     });
-                })
-                .catch(error => {
-                    console.error("Error:", error);
-                    typingSpan.innerHTML = "Error: " + error;
-                });
-            } else if(currentMode === "image") {
-                var payload = {
-                    mode: "image",
-                    message: message,
-                    api_key: apiKey,
-                    model: document.getElementById("image-model-select").value,
-                    image_height: parseInt(document.getElementById("image-height").value),
-                    image_width: parseInt(document.getElementById("image-width").value),
-                    steps: parseInt(document.getElementById("image-steps").value),
-                    hide_watermark: document.getElementById("hide-watermark").value === "true",
-                    embed_exif_metadata: document.getElementById("embed-exif").value === "true",
-                    negative_prompt: document.getElementById("negative-prompt").value,
-                    cfg_scale: parseFloat(document.getElementById("cfg-scale").value),
-                    lora_strength: parseFloat(document.getElementById("lora-strength").value),
-                    format: document.getElementById("image-format").value
-                };
-                var artStyle = document.getElementById("art-style").value;
-                payload.prompt = artStyle.trim() !== "" ? message + " in " + artStyle + " style" : message;
-                var seedValue = document.getElementById("seed").value;
-                if(seedValue.trim() !== "") { 
-                    payload.seed = seedValue;
                 }
-                var assistantMsgDiv = document.createElement("div");
-                assistantMsgDiv.className = "message assistant";
-                assistantMsgDiv.innerHTML = "<strong>assistant:</strong> <span class='typing'>Generating image...</span>";
-                document.getElementById("chat-container").appendChild(assistantMsgDiv);
-                document.getElementById("chat-container").scrollTop = document.getElementById("chat-container").scrollHeight;
-                var typingSpan = assistantMsgDiv.querySelector(".typing");
-                fetch("/chat", {
-                    method: "POST",
-                    headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify(payload)
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.image_url) {
-                        if (data.image_url.startsWith("Error:")) {
-                            typingSpan.innerHTML = data.image_url;
-                            fetch("/save_message", {
-                                method: "POST",
-                                headers: { "Content-Type": "application/json" },
-                                body: JSON.stringify({ role: "assistant", content: data.image_url })
-                            });
-                        } else {
-                            assistantMsgDiv.innerHTML = "<strong>assistant:</strong><br><img src='" + data.image_url + "' style='max-width:100%; border:1px solid #777; border-radius:4px;'/>";
-                            fetch("/save_message", {
-                                method: "POST",
-                                headers: { "Content-Type": "application/json" },
-                                body: JSON.stringify({ role: "assistant", content: "Image generated: " + data.image_url })
-                            });
-                        }
-                    } else {
-                        typingSpan.innerHTML = "No image returned.";
-                        fetch("/save_message", {
-                            method: "POST",
-                            headers: { "Content-Type": "application/json" },
-                            body: JSON.stringify({ role: "assistant", content: "No image returned." })
-                        });
-                    }
-                })
-                .catch(error => {
-                    console.error("Error:", error);
-                    typingSpan.innerHTML = "Error: " + error;
-                    fetch("/save_message", {
-                        method: "POST",
-                        headers: { "Content-Type": "application/json" },
-                        body: JSON.stringify({ role: "assistant", content: "Error: " + error })
-                    });
-                });
-            } else if(currentMode === "agent") {
-                executeAgentTask(message);
+            } else {
+                typingSpan.innerHTML = "No image returned.";
+                saveMessage("assistant", "No image returned.");
+            }
+        })
+        .catch(error => {
+            console.error("Error:", error);
+            typingSpan.innerHTML = "Error: " + error;
+            saveMessage("assistant", "Error: " + error);
+        });
+    } else if(currentMode === "agent") {
+        appendAndSaveMessage("user", message);
+        executeAgentTask(message);
+    }
+}
+// Image variants: one send becomes a gallery that fills in as each generation finishes
+function imageVariants() {
+    var axis = document.getElementById("variant-axis").value;
+    var values = document.getElementById("variant-values").value.split(",").map(v => v.trim()).filter(v => v !== "");
+    if (axis === "none") return null;
+    if (axis === "seed_count") return { seed_count: parseInt(values[0] || "4") };
+    if (!values.length) return null;
+    var variants = {};
+    variants[axis] = values;
+    return variants;
+}
+function generateImageVariants(payload) {
+    var messageDiv = appendMessage("assistant", "");
+    messageDiv.innerHTML = "<strong>assistant:</strong> <span class='typing'>Generating images...</span>";
+    var typingSpan = messageDiv.querySelector(".typing");
+    var gallery = document.createElement("div");
+    gallery.className = "image-gallery";
+    messageDiv.appendChild(gallery);
+    var shown = 0;
+    postJSON("/chat", payload, function(event) {
+        if (event.type !== "image") return;
+        var figure = document.createElement("figure");
+        figure.style.order = event.variant;
+        if (event.image_url.startsWith("data:")) {
+            var holder = document.createElement("div");
+            holder.innerHTML = "<img class='thumbnail' src='" + event.image_url + "'/>";
+            figure.appendChild(holder);
+            saveImageMessage(holder, event.image_url);
+        } else {
+            figure.innerHTML = "<div>" + event.image_url + "</div>";
+        }
+        var caption = document.createElement("figcaption");
+        caption.textContent = event.label;
+        figure.appendChild(caption);
+        gallery.appendChild(figure);
+        typingSpan.textContent = (++shown) + " ready";
+    })
+    .then(data => {
+        typingSpan.textContent = data && data.images ? data.images.length + " images" : "No images returned.";
+    })
+    .catch(error => {
+        console.error("Error:", error);
+        typingSpan.textContent = "Error: " + error;
+    });
+}
+// History resume: older pages load as the user scrolls up, and messages are only
+// rendered (marked.parse) while near the viewport; off-screen ones keep just their height.
+var historyBefore = null;
+var historyDone = false;
+var historyLoading = false;
+var chatContainerEl = document.getElementById("chat-container");
+var renderObserver = new IntersectionObserver(function(entries) {
+    entries.forEach(function(entry) {
+        var div = entry.target;
+        if (entry.isIntersecting && !div.dataset.rendered) {
+            renderHistoryMessage(div);
+        } else if (!entry.isIntersecting && div.dataset.rendered) {
+            div.style.height = div.offsetHeight + "px";
+            div.innerHTML = "";
+            delete div.dataset.rendered;
+        }
+    });
+}, { root: chatContainerEl, rootMargin: "1500px 0px" });
+function renderHistoryMessage(div) {
+    var message = div.historyMessage;
+    div.style.height = "";
+    div.classList.remove("placeholder");
+    if (message.image_url) {
+        div.innerHTML = "<strong>" + message.role + ":</strong><br>" + thumbnailMarkup(message.image_url);
+    } else {
+        div.innerHTML = "<strong>" + message.role + ":</strong> " + marked.parse(message.content);
+        addCopyButtonsToCodeBlocks(div);
+    }
+    div.dataset.rendered = "1";
+}
+function loadOlderMessages() {
+    if (historyLoading || historyDone) return;
+    historyLoading = true;
+    var url = "/history" + (historyBefore ? "?before=" + historyBefore : "");
+    fetch(url)
+    .then(response => response.json())
+    .then(data => {
+        var sentinel = document.getElementById("history-sentinel");
+        var firstPage = historyBefore === null;
+        var previousHeight = chatContainerEl.scrollHeight;
+        var fragment = document.createDocumentFragment();
+        data.messages.forEach(function(message) {
+            var div = document.createElement("div");
+            div.className = "message " + message.role + " placeholder";
+            div.historyMessage = message;
+            fragment.appendChild(div);
+            renderObserver.observe(div);
+        });
+        sentinel.after(fragment);
+        // Keep the view anchored: jump to the bottom on first load, otherwise hold position
+        if (firstPage) {
+            chatContainerEl.scrollTop = chatContainerEl.scrollHeight;
+        } else {
+            chatContainerEl.scrollTop += chatContainerEl.scrollHeight - previousHeight;
+        }
+        historyBefore = data.next_before;
+        historyDone = data.next_before === null;
+        historyLoading = false;
+    })
+    .catch(error => {
+        console.error("Error loading history:", error);
+        historyLoading = false;
+    });
+}
+new IntersectionObserver(function(entries) {
+    if (entries[0].isIntersecting) loadOlderMessages();
+}, { root: chatContainerEl, rootMargin: "300px 0px" }).observe(document.getElementById("history-sentinel"));
+function clearChat() {
+    chatContainerEl.querySelectorAll(".message").forEach(function(div) {
+        renderObserver.unobserve(div);
+        div.remove();
+    });
+    historyDone = true;
+}
+function startNewChat() {
+    var keepHistory = document.getElementById("keep-history").checked;
+    postJSON("/new_chat", { keep_history: keepHistory })
+    .then(data => {
+        if(data.success) {
+            if(!keepHistory) {
+                clearChat();
+            }
+        }
+    })
+    .catch(error => console.error("Error:", error));
+}
+var userInput = document.getElementById("user-input");
+userInput.addEventListener("keydown", function(event) {
+    if(event.key === "Enter") {
+        var enterToSend = document.getElementById("enter-to-send").checked;
+        if(enterToSend) {
+            event.preventDefault();
+            sendMessage();
+        }
+    }
+});
+var previewTimer = null;
+userInput.addEventListener("input", function() {
+    var text = this.value;
+    clearTimeout(previewTimer);
+    previewTimer = setTimeout(function() {
+        parseMarkdown(text, function(html) {
+            document.getElementById("preview-container").innerHTML = html;
+        });
+    }, 150);
+});
+if ("serviceWorker" in navigator) {
+    navigator.serviceWorker.register("/sw.js").catch(error => console.error("Service worker registration failed:", error));
+}
+'''
+
+# Page delivery: the template is rendered once at startup, CSS/JS/marked.js are served as
+# fingerprinted assets with immutable caching, and everything is precompressed (gzip, plus
+# brotli when installed). A service worker keeps the page and assets available offline.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/x-ndjson", "text/html", "text/css", "application/javascript"}
+MIN_COMPRESS_BYTES = 1024
+assets = {}
+
+def compressed_variants(body, dynamic=False):
+    # Dynamic responses favour speed, static assets are compressed once at the highest level
+    variants = {"identity": body, "gzip": gzip.compress(body, 5 if dynamic else 9)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=4 if dynamic else 11)
+    return variants
+
+def preferred_encoding(available):
+    for encoding in ("br", "gzip"):
+        if encoding in available and request.accept_encodings[encoding]:
+            return encoding
+    return "identity"
+
+def precompressed_entry(body, mimetype):
+    return {"variants": compressed_variants(body), "mimetype": mimetype, "etag": hashlib.sha256(body).hexdigest()[:16]}
+
+def build_asset(name, body, mimetype):
+    entry = precompressed_entry(body, mimetype)
+    base, ext = os.path.splitext(name)
+    fingerprinted = f"{base}.{entry['etag']}{ext}"
+    assets[fingerprinted] = entry
+    return f"/assets/{fingerprinted}"
+
+def send_precompressed(entry, cache_control):
+    if request.if_none_match.contains(entry["etag"]):
+        response = Response(status=304)
+    else:
+        encoding = preferred_encoding(entry["variants"])
+        response = Response(entry["variants"][encoding], mimetype=entry["mimetype"])
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = cache_control
+    response.set_etag(entry["etag"])
+    return response
+
+@app.after_request
+def compress_response(response):
+    if (response.mimetype not in COMPRESSIBLE_MIMETYPES or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers or response.status_code in (204, 304)):
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+    encoding = preferred_encoding(("br", "gzip") if brotli is not None else ("gzip",))
+    if encoding == "identity":
+        return response
+    if encoding == "br":
+        response.set_data(brotli.compress(body, quality=4))
+    else:
+        response.set_data(gzip.compress(body, 5))
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+@app.route("/assets/<name>")
+def asset(name):
+    entry = assets.get(name)
+    if entry is None:
+        return jsonify({"error": "Asset not found"}), 404
+    return send_precompressed(entry, "public, max-age=31536000, immutable")
+
+@app.route("/bench/render")
+def render_benchmark():
+    return send_precompressed(render_bench_page, "no-cache")
+
+@app.route("/bench/images")
+def image_benchmark():
+    response = send_precompressed(image_bench_page, "no-cache")
+    # measureUserAgentSpecificMemory is only available to cross-origin isolated pages
+    response.headers["Cross-Origin-Opener-Policy"] = "same-origin"
+    response.headers["Cross-Origin-Embedder-Policy"] = "require-corp"
+    return response
+
+@app.route("/sw.js")
+def service_worker():
+    return send_precompressed(service_worker_script, "no-cache")
+
+# Browser benchmark: per-chunk render cost of full re-parsing versus the incremental renderer
+RENDER_BENCH_HTML = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Markdown Render Benchmark</title>
+    <meta name="render-worker" content="{{ worker_url }}">
+    <script src="{{ marked_url }}"></script>
+    <script src="{{ render_url }}"></script>
+</head>
+<body>
+    <h1>Markdown Render Benchmark</h1>
+    <p>Renders a synthetic ~7000-token reply in small chunks and reports the cost per chunk.</p>
+    <button onclick="runBenchmark()">Run</button>
+    <pre id="results"></pre>
+    <div id="target" style="height: 200px; overflow: hidden;"></div>
+    <script>
+        function makeReply(tokens) {
+            var parts = [];
+            var words = 0;
+            for (var i = 0; words < tokens; i++) {
+                if (i % 5 === 4) {
+                    parts.push("```python\\nfor item in range(" + i + "):\\n    print(item * 2)\\n\\nprint('done')\\n```");
+                    words += 12;
+                } else if (i % 5 === 2) {
+                    parts.push("- first point about **item " + i + "**\\n- second point with `code`\\n- third point");
+                    words += 16;
+                } else {
+                    parts.push("Paragraph " + i + " explains the *details* of step " + i + " in plain words, with a [link](https://example.com) and some more text to read.");
+                    words += 24;
+                }
             }
+            return parts.join("\\n\\n");
+        }
+        function summarize(name, times, total) {
+            times.sort(function(a, b) { return a - b; });
+            var pick = function(p) { return times[Math.min(times.length - 1, Math.floor(times.length * p))].toFixed(3); };
+            return name + ": chunks=" + times.length + " p50=" + pick(0.5) + "ms p95=" + pick(0.95) +
+                "ms max=" + times[times.length - 1].toFixed(3) + "ms total=" + total.toFixed(1) + "ms\\n";
         }
-        function startNewChat() {
-            var keepHistory = document.getElementById("keep-history").checked;
-            fetch("/new_chat", {
-                method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ keep_history: keepHistory })
-            })
-            .then(response => response.json())
-            .then(data => {
-                if(data.success) {
-                    if(!keepHistory) {
-                        document.getElementById("chat-container").innerHTML = "";
+        function chunks(text, size) {
+            var out = [];
+            for (var i = 0; i < text.length; i += size) out.push(text.slice(i, i + size));
+            return out;
+        }
+        function runFullReparse(text, size) {
+            var target = document.getElementById("target");
+            var times = [];
+            var accumulated = "";
+            var start = performance.now();
+            chunks(text, size).forEach(function(chunk) {
+                var t0 = performance.now();
+                accumulated += chunk;
+                target.innerHTML = marked.parse(accumulated);
+                times.push(performance.now() - t0);
+            });
+            return summarize("full re-parse (main thread)", times, performance.now() - start);
+        }
+        function runIncremental(name, text, size) {
+            return new Promise(function(resolve) {
+                var renderer = new IncrementalRenderer(document.getElementById("target"));
+                var pieces = chunks(text, size);
+                var times = [];
+                var index = 0;
+                var start = performance.now();
+                var sent = 0;
+                // Feed the next chunk once the previous one is on screen, like a live stream
+                var next = function() {
+                    if (index === pieces.length) {
+                        renderer.finish(function() { resolve(summarize(name, times, performance.now() - start)); });
+                        return;
                     }
+                    sent = performance.now();
+                    renderer.append(pieces[index++]);
+                };
+                renderer.onRender = function() {
+                    times.push(performance.now() - sent);
+                    next();
+                };
+                next();
+            });
+        }
+        async function runBenchmark() {
+            var results = document.getElementById("results");
+            var text = makeReply(7000);
+            var size = 20;
+            results.textContent = "Reply: " + text.length + " chars, chunk size " + size + "\\n";
+            results.textContent += runFullReparse(text, size);
+            var worker = renderWorker;
+            renderWorker = null;
+            results.textContent += await runIncremental("incremental (main thread)", text, size);
+            renderWorker = worker;
+            if (renderWorker) {
+                results.textContent += await runIncremental("incremental (web worker, round trip)", text, size);
+            }
+        }
+    </script>
+</body>
+</html>
+'''
+
+# Browser benchmark: load time and measured page memory of the session's images, full size vs thumbnails
+IMAGE_BENCH_HTML = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Image Memory Benchmark</title>
+</head>
+<body>
+    <h1>Image Memory Benchmark</h1>
+    <p>Renders the images on the first history page of this session, once full size and once as thumbnails,
+    and reports load time and the memory the page uses with them on screen.</p>
+    <button onclick="runBenchmark()">Run</button>
+    <pre id="results"></pre>
+    <div id="target"></div>
+    <script>
+        async function measureMemory() {
+            // measureUserAgentSpecificMemory includes decoded images but needs cross-origin isolation;
+            // performance.memory (Chromium) only covers the JS heap
+            if (window.crossOriginIsolated && performance.measureUserAgentSpecificMemory) {
+                return {bytes: (await performance.measureUserAgentSpecificMemory()).bytes, source: "measureUserAgentSpecificMemory"};
+            }
+            if (performance.memory) {
+                return {bytes: performance.memory.usedJSHeapSize, source: "performance.memory (JS heap only)"};
+            }
+            return null;
+        }
+        async function render(urls, thumbnails) {
+            var target = document.getElementById("target");
+            target.innerHTML = "";
+            var start = performance.now();
+            await Promise.all(urls.map(function(url) {
+                var img = new Image();
+                if (thumbnails) {
+                    img.width = 256;
+                    img.src = url + "?w=256";
+                    img.srcset = url + "?w=256 1x, " + url + "?w=512 2x";
+                } else {
+                    img.src = url;
                 }
-            })
-            .catch(error => console.error("Error:", error));
+                target.appendChild(img);
+                return img.decode().catch(function() {});
+            }));
+            return performance.now() - start;
+        }
+        function mb(bytes) {
+            return (bytes / 1048576).toFixed(1) + " MB";
         }
-        var userInput = document.getElementById("user-input");
-        userInput.addEventListener("keydown", function(event) {
-            if(event.key === "Enter") {
-                var enterToSend = document.getElementById("enter-to-send").checked;
-                if(enterToSend) {
-                    event.preventDefault();
-                    sendMessage();
+        async function runBenchmark() {
+            var results = document.getElementById("results");
+            var page = await (await fetch("/history")).json();
+            var urls = page.messages.filter(function(m) { return m.image_url; }).map(function(m) { return m.image_url; });
+            if (!urls.length) {
+                results.textContent = "No images on the first history page of this session.";
+                return;
+            }
+            var baseline = await measureMemory();
+            if (!baseline) {
+                results.textContent = "This browser exposes no memory measurement API.\n";
+            } else {
+                results.textContent = urls.length + " images, memory from " + baseline.source + ", baseline " + mb(baseline.bytes) + "\n";
+            }
+            var cases = [["full size", false], ["thumbnails", true]];
+            for (var i = 0; i < cases.length; i++) {
+                var elapsed = await render(urls, cases[i][1]);
+                var line = cases[i][0] + ": " + elapsed.toFixed(0) + " ms to load and decode";
+                var memory = baseline && await measureMemory();
+                if (memory) {
+                    line += ", " + mb(memory.bytes) + " in use (" + mb(memory.bytes - baseline.bytes) + " over baseline)";
                 }
+                results.textContent += line + "\n";
             }
-        });
-        userInput.addEventListener("input", function() {
-            var previewContainer = document.getElementById("preview-container");
-            previewContainer.innerHTML = marked.parse(this.value);
-        });
+            document.getElementById("target").innerHTML = "";
+        }
     </script>
 </body>
 </html>
 '''
 
+SERVICE_WORKER_JS = '''
+const CACHE = "venice-{{ version }}";
+const PRECACHE = {{ precache|safe }};
+self.addEventListener("install", function(event) {
+    event.waitUntil(caches.open(CACHE).then(function(cache) { return cache.addAll(PRECACHE); }));
+    self.skipWaiting();
+});
+self.addEventListener("activate", function(event) {
+    event.waitUntil(caches.keys().then(function(keys) {
+        return Promise.all(keys.filter(function(key) { return key !== CACHE; }).map(function(key) { return caches.delete(key); }));
+    }));
+    self.clients.claim();
+});
+self.addEventListener("fetch", function(event) {
+    var url = new URL(event.request.url);
+    if (event.request.method !== "GET" || url.origin !== location.origin) return;
+    if (url.pathname.startsWith("/assets/")) {
+        // Fingerprinted assets never change, so serve them from the cache first
+        event.respondWith(caches.match(event.request).then(function(cached) {
+            return cached || fetch(event.request);
+        }));
+    } else if (url.pathname === "/") {
+        // Prefer a fresh page, fall back to the cached one when offline
+        event.respondWith(fetch(event.request).then(function(response) {
+            var copy = response.clone();
+            caches.open(CACHE).then(function(cache) { cache.put("/", copy); });
+            return response;
+        }).catch(function() { return caches.match("/"); }));
+    }
+});
+'''
+
+with open(os.path.join(STATIC_DIR, "marked.js"), "rb") as f:
+    marked_url = build_asset("marked.js", f.read(), "application/javascript")
+worker_url = build_asset("render-worker.js", app.jinja_env.from_string(RENDER_WORKER_JS).render(
+    marked_url=marked_url).encode("utf-8"), "application/javascript")
+render_url = build_asset("render.js", RENDER_JS.encode("utf-8"), "application/javascript")
+css_url = build_asset("app.css", INDEX_CSS.encode("utf-8"), "text/css")
+js_url = build_asset("app.js", INDEX_JS.encode("utf-8"), "application/javascript")
+page_urls = {"css_url": css_url, "js_url": js_url, "marked_url": marked_url, "render_url": render_url, "worker_url": worker_url}
+index_page = precompressed_entry(app.jinja_env.from_string(INDEX_HTML).render(
+    channel_enabled="1" if Sock is not None else "0", **page_urls).encode("utf-8"), "text/html")
+render_bench_page = precompressed_entry(
+    app.jinja_env.from_string(RENDER_BENCH_HTML).render(**page_urls).encode("utf-8"), "text/html")
+image_bench_page = precompressed_entry(IMAGE_BENCH_HTML.encode("utf-8"), "text/html")
+service_worker_script = precompressed_entry(
+    app.jinja_env.from_string(SERVICE_WORKER_JS).render(
+        version=index_page["etag"], precache=json.dumps(["/"] + sorted(set(page_urls.values())))).encode("utf-8"),
+    "application/javascript")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Venice Chat App")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("serve", help="Run the web app (default)")
+    replay_parser = subparsers.add_parser("replay", help="Replay a recorded trace against a running build")
+    replay_parser.add_argument("trace", help="Trace file written with VENICE_TRACE_PATH")
+    replay_parser.add_argument("--target", default="http://127.0.0.1:5000", help="Base URL of the build under test")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="Playback speed multiplier (0 = as fast as possible)")
+    bench_cache_parser = subparsers.add_parser("bench-semantic-cache", help="Benchmark semantic cache lookup latency")
+    bench_cache_parser.add_argument("--entries", type=int, default=100000)
+    bench_cache_parser.add_argument("--lookups", type=int, default=200)
+    bench_search_parser = subparsers.add_parser("bench-search", help="Benchmark /search latency on a synthetic database")
+    bench_search_parser.add_argument("--rows", type=int, default=2000000)
+    bench_search_parser.add_argument("--queries", type=int, default=50)
+    bench_channel_parser = subparsers.add_parser("bench-channel", help="Benchmark the WebSocket channel against fetch")
+    bench_channel_parser.add_argument("--requests", type=int, default=500)
+    bench_channel_parser.add_argument("--concurrency", type=int, default=8)
+    export_parser = subparsers.add_parser("export", help="Export sessions as NDJSON (gzip-compressed for .gz paths)")
+    export_parser.add_argument("output", nargs="?", default="-", help="Output file, or - for stdout")
+    export_parser.add_argument("--session", help="Export only this session id")
+    export_parser.add_argument("--db", default=DB_PATH)
+    export_parser.add_argument("--shards", type=int, default=DB_SHARDS)
+    import_parser = subparsers.add_parser("import", help="Bulk-load an NDJSON export, keeping its session ids "
+                                                         "(stop the app first)")
+    import_parser.add_argument("input", help="Export file (plain or gzip), or - for stdin")
+    import_parser.add_argument("--db", default=DB_PATH)
+    import_parser.add_argument("--shards", type=int, default=DB_SHARDS)
+    compact_parser = subparsers.add_parser("compact", help="Apply retention now and reclaim free space in the database")
+    compact_parser.add_argument("--db", default=DB_PATH)
+    compact_parser.add_argument("--shards", type=int, default=DB_SHARDS)
+    shard_parser = subparsers.add_parser("shard", help="Split a single-file database into shard files")
+    shard_parser.add_argument("--shards", type=int, required=True)
+    shard_parser.add_argument("--db", default=DB_PATH)
+    bench_shards_parser = subparsers.add_parser("bench-shards", help="Benchmark concurrent save_message throughput per shard count")
+    bench_shards_parser.add_argument("--writers", type=int, default=16)
+    bench_shards_parser.add_argument("--messages", type=int, default=4000)
+    bench_images_parser = subparsers.add_parser("bench-images", help="Benchmark page cost of an image-heavy session")
+    bench_images_parser.add_argument("--images", type=int, default=200)
+    args = parser.parse_args(argv)
+    if args.command == "replay":
+        replay_trace(args.trace, args.target.rstrip("/"), args.speed)
+    elif args.command == "bench-semantic-cache":
+        benchmark_semantic_cache(args.entries, args.lookups)
+    elif args.command == "bench-search":
+        benchmark_search(args.rows, args.queries)
+    elif args.command == "bench-channel":
+        benchmark_channel(args.requests, args.concurrency)
+    elif args.command == "bench-images":
+        benchmark_images(args.images)
+    elif args.command == "export":
+        export_to_file(args.output, args.session, ShardedStorage(args.db, args.shards))
+    elif args.command == "import":
+        import_from_file(args.input, ShardedStorage(args.db, args.shards))
+    elif args.command == "compact":
+        for db_path in ShardedStorage(args.db, args.shards).paths():
+            if os.path.exists(db_path):
+                compact_database(db_path)
+    elif args.command == "shard":
+        split_database(args.db, args.shards)
+    elif args.command == "bench-shards":
+        benchmark_shards(args.writers, args.messages)
+    else:
+        start_retention_worker()
+        app.run(debug=True)
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    main()
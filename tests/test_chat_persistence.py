@@ -0,0 +1,77 @@
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import VeniceAgents as va
+
+
+@pytest.fixture
+def app_env(tmp_path, monkeypatch):
+    storage = va.ShardedStorage(str(tmp_path / "conversation.db"))
+    storage.init()
+    monkeypatch.setattr(va, "storage", storage)
+    monkeypatch.setattr(va, "semantic_cache", None)
+    monkeypatch.setattr(va, "history_indexes", va.OrderedDict())
+    monkeypatch.setattr(va, "history_cache_bytes", 0)
+    monkeypatch.setattr(va, "metrics", {})
+    upstream = []
+
+    def send_upstream(endpoint, payload, headers):
+        upstream.append(payload)
+        body = {"choices": [{"message": {"content": f"reply {len(upstream)}"}}]}
+        return va.RecordedResponse(200, json.dumps(body))
+
+    monkeypatch.setattr(va, "send_upstream", send_upstream)
+    client = va.app.test_client()
+    with client.session_transaction() as browser_session:
+        browser_session["session_id"] = "test-session"
+    return client, storage, upstream
+
+
+def count_rows(storage):
+    conn = sqlite3.connect(storage.path_for("test-session"))
+    try:
+        return conn.execute("SELECT COUNT(*) FROM messages WHERE session_id=?", ("test-session",)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def send_turn(client, turn):
+    return client.post("/chat", json={"mode": "text", "message": f"question {turn}",
+                                      "message_id": f"user-{turn}", "reply_id": f"reply-{turn}"}).get_json()
+
+
+def test_each_turn_stores_two_rows_and_sends_no_repeats(app_env):
+    client, storage, upstream = app_env
+    for turn in range(1, 4):
+        reply = send_turn(client, turn)
+        assert reply["reply"] == f"reply {turn}"
+        assert count_rows(storage) == 2 * turn
+        # The page also saves the user message through /save_message; it must not add a row
+        client.post("/save_message", json={"role": "user", "content": f"question {turn}",
+                                           "message_id": f"user-{turn}"})
+        assert count_rows(storage) == 2 * turn
+
+        messages = upstream[-1]["messages"]
+        turns = [(msg["role"], msg["content"]) for msg in messages if msg["role"] != "system"]
+        assert len(turns) == len(set(turns))
+        assert turns[-1] == ("user", f"question {turn}")
+        assert len(turns) == 2 * turn - 1
+    assert va.metrics["chat.turns"] == 3
+    # Prompt tokens grow with the conversation only, one question and one reply per earlier turn
+    expected = sum(va.estimate_tokens(payload["messages"]) for payload in upstream)
+    assert va.metrics["chat.prompt_tokens"] == expected
+
+
+def test_retried_reply_id_is_not_stored_or_sent_again(app_env):
+    client, storage, upstream = app_env
+    first = send_turn(client, 1)
+    retry = send_turn(client, 1)
+    assert retry["reply"] == first["reply"]
+    assert count_rows(storage) == 2
+    assert len(upstream) == 1